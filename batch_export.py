@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Re-render the exported images and data tables of saved measurements without the
+window, e.g. after changing the draw color or font size for a whole season.
+
+Every save in fish-mesh writes a sidecar (S-<name>.json) next to the exported
+image (P-<name>.jpg), with the box corners, rotation, margin, box size and
+rulers. The photos are re-read from the photo directory and
+rendered in parallel, one photo per process, and the measurements are stored in
+the results of the output folder (see results_store.py).
+
+Usage: python batch_export.py PHOTO_DIR [--sidecars DIR] [--output DIR] [--settings FILE] [--workers N]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from settings import Settings, DEFAULT_SETTINGS_PATH
+from image_loader import decode_full_image
+from image_metadata import read_image_metadata
+from export import (
+    ExportRecord, measurement_rows, measurement_table, read_sidecar, render_export, write_image,
+    write_table,
+)
+from results_store import RESULTS_DATABASE_NAME, ResultsStore
+
+
+logger = logging.getLogger(__name__)
+
+
+def export_sidecar(
+    sidecar_path: Path, photo_dir: Path, output_dir: Path, settings: Settings
+) -> Tuple[str, List[Dict]]:
+    """
+    Render the exports of one sidecar (runs in a worker process). Returns the image
+    name and measurement rows, which are stored by the main process (see ResultsStore).
+    """
+    record = read_sidecar(sidecar_path)
+    photo_path = find_photo(record, photo_dir)
+    if photo_path is None:
+        raise FileNotFoundError(f"Photo {Path(record.source_image).name} of {sidecar_path.name} not found in {photo_dir}")
+    metadata = read_image_metadata(str(photo_path))
+    img, _ = decode_full_image(str(photo_path), metadata.orientation)
+    stem = sidecar_path.stem[len("S-"):]
+    write_image(output_dir / record.image_file, render_export(img, record, settings))
+    rows = measurement_rows(record, metadata.image_info())
+    if settings.save_data_per_photo:
+        write_table(output_dir / f"D-{stem}.xlsx", measurement_table(rows))
+    return record.image_file, rows
+
+
+def find_photo(record: ExportRecord, photo_dir: Path) -> Optional[Path]:
+    """The measured photo, by name in photo_dir (the photos might have been moved since)"""
+    photo_path = photo_dir / Path(record.source_image).name
+    if photo_path.exists():
+        return photo_path
+    if Path(record.source_image).exists():
+        return Path(record.source_image)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-render fish-mesh exports from their sidecars")
+    parser.add_argument("photo_dir", type=Path, help="directory of the measured photos")
+    parser.add_argument("--sidecars", type=Path, help="directory of the sidecars (default: photo_dir)")
+    parser.add_argument("--output", type=Path, help="directory for the exports (default: the sidecar directory)")
+    parser.add_argument(
+        "--settings", type=Path,
+        help=f"settings file for the draw color, font size and point size (default: {DEFAULT_SETTINGS_PATH.name}, if any)"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes (default: all cores)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    sidecar_dir = args.sidecars or args.photo_dir
+    output_dir = args.output or sidecar_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if args.settings is not None:
+        settings = Settings.from_file(args.settings)
+    elif DEFAULT_SETTINGS_PATH.exists():
+        settings = Settings.from_file(DEFAULT_SETTINGS_PATH)
+    else:
+        settings = Settings()
+    settings.validate()
+
+    sidecar_paths = sorted(sidecar_dir.glob("S-*.json"))
+    results_store = ResultsStore(output_dir / RESULTS_DATABASE_NAME)
+    logger.info(f"Exporting {len(sidecar_paths)} photos with {args.workers} processes")
+    start_time = time.perf_counter()
+    num_failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(export_sidecar, sidecar_path, args.photo_dir, output_dir, settings): sidecar_path
+            for sidecar_path in sidecar_paths
+        }
+        for future in as_completed(futures):
+            try:
+                image_file, rows = future.result()
+                results_store.save(image_file, rows)
+                logger.info(f"Exported {image_file}")
+            except Exception as e:
+                num_failed += 1
+                logger.error(f"Failed to export {futures[future].name}: {e}")
+    logger.info(
+        f"Exported {len(sidecar_paths) - num_failed} of {len(sidecar_paths)} photos"
+        f" in {time.perf_counter() - start_time:.1f} s"
+    )
+    if num_failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # (for executables made with pyinstaller)
+    main()
@@ -0,0 +1,196 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+
+from geometry import reorder_corner_points
+from image_loader import create_preview_image
+
+
+logger = logging.getLogger(__name__)
+
+# Detection runs on a copy downscaled to at most this size (the box is large, so details aren't needed):
+DETECTION_SIZE = 640
+# A detected box is only used if it covers at least this fraction of the image,
+MIN_BOX_AREA_RATIO = 0.1
+# its outline is close to a quadrilateral (area of the contour relative to the fitted quadrilateral),
+MIN_QUADRILATERAL_FIT = 0.9
+# and its opposite sides are of similar length (shortest relative to longest, allowing for perspective):
+MIN_SIDE_RATIO = 0.5
+# Maximum distance (relative to the contour perimeter) between the contour and the fitted quadrilateral:
+APPROXIMATION_TOLERANCE = 0.02
+# Corner snapping: minimum standard deviation of the intensity around a point for it to be snapped
+# (flat regions only have corners from noise),
+MIN_CORNER_CONTRAST = 8.0
+# and half size of the window used for the sub-pixel refinement:
+SUBPIX_WINDOW = 5
+# Fiducial markers: minimum number of detected markers of the layout for a fit,
+MIN_MARKERS = 2
+# and maximum distance (in pixels) from the fitted homography for a marker corner to count as an inlier:
+MARKER_REPROJECTION_THRESHOLD = 3.0
+
+
+def detect_reference_box(img) -> Optional[np.ndarray]:
+    """
+    Find the reference box (the measuring board) in img, as the largest
+    quadrilateral outline found by edge and contour detection.
+
+    Returns the (4, 2) corners relative to the image size (0-1), ordered
+    anti-clockwise from the upper left corner, or None if no box was found
+    with confidence. Since the corners are relative, they apply to any
+    resolution of the image (e.g. detecting on a preview is enough).
+    """
+    small = create_preview_image(img, DETECTION_SIZE)
+    img_height, img_width = small.shape[:2]
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    # Edge thresholds relative to the median intensity (works for both dark and bright photos):
+    median = float(np.median(gray))
+    edges = cv2.Canny(gray, 0.66 * median, 1.33 * median)
+    # Close small gaps in the outline (e.g. where the fish or a hand covers the edge of the box):
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    best_corners = None
+    best_area = MIN_BOX_AREA_RATIO * img_width * img_height
+    for contour in contours:
+        contour_area = cv2.contourArea(contour)
+        if contour_area < best_area:
+            continue
+        quadrilateral = cv2.approxPolyDP(contour, APPROXIMATION_TOLERANCE * cv2.arcLength(contour, True), True)
+        if len(quadrilateral) != 4 or not cv2.isContourConvex(quadrilateral):
+            continue
+        quadrilateral_area = cv2.contourArea(quadrilateral)
+        if contour_area / quadrilateral_area < MIN_QUADRILATERAL_FIT:
+            continue
+        corners = reorder_corner_points(quadrilateral.reshape((4, 2)).astype(np.float64), "anti-clockwise")
+        corners = corners.reshape((4, 2))
+        side_lengths = np.hypot(*(corners - np.roll(corners, -1, axis=0)).T)
+        left, bottom, right, top = side_lengths
+        if min(left, right) / max(left, right) < MIN_SIDE_RATIO or min(top, bottom) / max(top, bottom) < MIN_SIDE_RATIO:
+            continue
+        best_corners = corners
+        best_area = contour_area
+
+    if best_corners is None:
+        logger.info("No reference box detected")
+        return None
+    logger.info(f"Detected reference box covering {best_area / (img_width * img_height):.0%} of the image")
+    return best_corners / (img_width, img_height)
+
+
+def refine_corner(img, x: float, y: float, radius: int) -> Optional[Tuple[float, float]]:
+    """
+    Find the strongest corner (e.g. a corner of the reference box) closest to x, y
+    within radius (pixels of img), with sub-pixel accuracy. Only a window of
+    2 * radius around the point is read (also when img is memory mapped).
+    Returns the corner position in img, or None if there's no clear corner.
+    """
+    img_height, img_width = img.shape[:2]
+    x0 = max(int(x) - radius, 0)
+    y0 = max(int(y) - radius, 0)
+    x1 = min(int(x) + radius + 1, img_width)
+    y1 = min(int(y) + radius + 1, img_height)
+    if x1 - x0 < 2 * SUBPIX_WINDOW + 3 or y1 - y0 < 2 * SUBPIX_WINDOW + 3:
+        return None
+    crop = np.ascontiguousarray(img[y0:y1, x0:x1])
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    if gray.std() < MIN_CORNER_CONTRAST:
+        return None
+    candidates = cv2.goodFeaturesToTrack(gray, maxCorners=5, qualityLevel=0.3, minDistance=SUBPIX_WINDOW)
+    if candidates is None:
+        return None
+    candidates = candidates.reshape((-1, 2))
+    distances = np.hypot(*(candidates - (x - x0, y - y0)).T)
+    closest = np.argmin(distances)
+    if distances[closest] > radius:
+        return None
+    corner = cv2.cornerSubPix(
+        gray,
+        candidates[closest].reshape((1, 1, 2)).astype(np.float32),
+        (SUBPIX_WINDOW, SUBPIX_WINDOW),
+        (-1, -1),
+        (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 20, 0.01),
+    ).reshape(2)
+    return x0 + float(corner[0]), y0 + float(corner[1])
+
+
+def markers_available() -> bool:
+    """ArUco markers require an OpenCV build with the aruco module (opencv-contrib-python or OpenCV >= 4.7)"""
+    return hasattr(cv2, "aruco")
+
+
+def detect_markers(gray, dictionary_name: str) -> Tuple[List[np.ndarray], List[int]]:
+    """Corners ((4, 2) each, clockwise from the marker's upper left corner) and ids of the detected markers"""
+    dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dictionary_name))
+    if hasattr(cv2.aruco, "ArucoDetector"):  # OpenCV >= 4.7
+        detector = cv2.aruco.ArucoDetector(dictionary, cv2.aruco.DetectorParameters())
+        corners, ids, _ = detector.detectMarkers(gray)
+    else:
+        corners, ids, _ = cv2.aruco.detectMarkers(
+            gray, dictionary, parameters=cv2.aruco.DetectorParameters_create()
+        )
+    if ids is None:
+        return [], []
+    return [c.reshape((4, 2)) for c in corners], ids.reshape(-1).tolist()
+
+
+def detect_marker_box(
+    img,
+    dictionary_name: str,
+    marker_positions: Dict[str, List[float]],
+    marker_size: float,
+    box_size: Tuple[float, float],
+) -> Optional[np.ndarray]:
+    """
+    Find the reference box from fiducial (ArUco) markers printed at known positions.
+
+    marker_positions: marker id -> (x, y) position of the marker center on the box,
+    in the same unit as box_size (width, height), with the origin at the upper left
+    corner of the box. The markers are assumed to be printed upright, with sides
+    of marker_size.
+
+    All corners of all detected markers of the layout are used to fit the homography
+    from the box to the image, with RANSAC, so markers that are covered (e.g. by the
+    fish) or misdetected don't matter as long as MIN_MARKERS are found.
+    Returns the (4, 2) box corners relative to the image size (0-1), ordered
+    anti-clockwise from the upper left corner of the box, or None if the box
+    wasn't found.
+    """
+    if not markers_available():
+        logger.warning("Fiducial markers are not supported by the installed OpenCV (no cv2.aruco)")
+        return None
+    img_height, img_width = img.shape[:2]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    all_marker_corners, marker_ids = detect_markers(gray, dictionary_name)
+
+    box_points = []
+    image_points = []
+    # Marker corners relative to the marker center (upper left, upper right, lower right, lower left):
+    half_size = marker_size / 2
+    corner_offsets = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], np.float64) * half_size
+    for marker_id, marker_corners in zip(marker_ids, all_marker_corners):
+        if str(marker_id) not in marker_positions:
+            continue  # not part of the layout
+        box_points.append(np.array(marker_positions[str(marker_id)], np.float64) + corner_offsets)
+        image_points.append(marker_corners)
+    if len(box_points) < MIN_MARKERS:
+        logger.info(f"Found {len(box_points)} of the {len(marker_positions)} markers (at least {MIN_MARKERS} needed)")
+        return None
+
+    homography, inliers = cv2.findHomography(
+        np.concatenate(box_points), np.concatenate(image_points).astype(np.float64),
+        cv2.RANSAC, MARKER_REPROJECTION_THRESHOLD,
+    )
+    if homography is None:
+        logger.info("Unable to fit the box to the detected markers")
+        return None
+    logger.info(
+        f"Found {len(box_points)} of the {len(marker_positions)} markers"
+        f" ({int(inliers.sum())} of {len(inliers)} marker corners fit the box)"
+    )
+    box_width, box_height = box_size
+    box_corners = np.array([[0, 0], [0, box_height], [box_width, box_height], [box_width, 0]], np.float64)
+    corners = cv2.perspectiveTransform(box_corners.reshape((-1, 1, 2)), homography).reshape((4, 2))
+    return corners / (img_width, img_height)
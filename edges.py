@@ -0,0 +1,56 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+
+
+# Minimum directional derivative (Sobel, on 0-255 intensities) to count as an edge
+# (about a step of 10 intensity levels):
+MIN_EDGE_STRENGTH = 40.0
+
+
+class EdgeMap:
+    """
+    Intensity gradient of an image, computed once and reused for snapping
+    points onto edges (e.g. ruler endpoints onto the outline of a fish).
+    """
+    def __init__(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        gray = cv2.GaussianBlur(gray, (0, 0), sigmaX=1.0)
+        self.gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+        self.gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+        self.height, self.width = gray.shape
+
+    def snap_along(self, x: float, y: float, direction, radius: float) -> Optional[Tuple[float, float]]:
+        """
+        The strongest edge crossing the line through x, y in direction (dx, dy),
+        within radius pixels of x, y (with sub-pixel accuracy), or None if
+        there's no clear edge.
+        """
+        direction = np.asarray(direction, np.float64)
+        length = np.hypot(*direction)
+        if length == 0:
+            return None
+        ux, uy = direction / length
+        steps = np.arange(-np.ceil(radius), np.ceil(radius) + 1)
+        xs = x + steps * ux
+        ys = y + steps * uy
+        inside = (xs >= 0) & (xs <= self.width - 1) & (ys >= 0) & (ys <= self.height - 1)
+        if not inside.any():
+            return None
+        steps, xs, ys = steps[inside], xs[inside], ys[inside]
+        rows = np.rint(ys).astype(np.intp)
+        cols = np.rint(xs).astype(np.intp)
+        # Edges across the line (the derivative along the line direction):
+        strength = np.abs(self.gx[rows, cols] * ux + self.gy[rows, cols] * uy)
+        best = int(np.argmax(strength))
+        if strength[best] < MIN_EDGE_STRENGTH:
+            return None
+        step = steps[best]
+        if 0 < best < len(strength) - 1:
+            # Sub-pixel position from a parabola through the strongest sample and its neighbours:
+            before, at, after = strength[best - 1:best + 2]
+            curvature = before - 2 * at + after
+            if curvature < 0:
+                step += 0.5 * (before - after) / curvature
+        return x + step * ux, y + step * uy
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the ruler lengths and label anchors (rulers.RulerStore.lengths()
+and rulers.ruler_label_anchors()), computed for all rulers in one NumPy pass,
+against the previous implementation looping over the rulers in Python.
+
+Also checks that both give the same results.
+
+Run from the project root directory: python experimental/ruler_benchmark.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from geometry import relative_to_cm_scale  # noqa: E402
+from rulers import RulerStore, ruler_label_anchors  # noqa: E402
+
+MARGIN_RATIO = 0.05
+BOX_WIDTH = 40
+BOX_HEIGHT = 30
+LABEL_DISTANCE = 9
+NUM_RULERS = [10, 100, 1000, 10000]
+
+
+def loop_lengths_cm(endpoints):
+    """The previous implementation of read_rulers()"""
+    img_to_box_scale_ratio = 1 / (1 - 2 * MARGIN_RATIO)
+    lengths = []
+    for p1, p2 in endpoints:
+        dx = p1[0] - p2[0]
+        dy = p1[1] - p2[1]
+        lengths.append(np.sqrt(
+            (img_to_box_scale_ratio * BOX_WIDTH * dx) ** 2
+            + (img_to_box_scale_ratio * BOX_HEIGHT * dy) ** 2
+        ))
+    return lengths
+
+
+def loop_label_positions(endpoints):
+    """The previous implementation of find_ruler_label_position() (relative coordinates)"""
+    positions = []
+    for p1, p2 in endpoints:
+        dx = p2[0] - p1[0]
+        dy = p2[1] - p1[1]
+        if abs(dy) > abs(dx):
+            if abs(p1[1] - 0.5) <= abs(p2[1] - 0.5):
+                label_point, placement = p1, "over" if dy >= 0 else "under"
+            else:
+                label_point, placement = p2, "under" if dy >= 0 else "over"
+        else:
+            if abs(p1[0] - 0.5) <= abs(p2[0] - 0.5):
+                label_point, placement = p1, "left" if dx >= 0 else "right"
+            else:
+                label_point, placement = p2, "right" if dx >= 0 else "left"
+        x, y = label_point
+        if placement == "over":
+            y -= LABEL_DISTANCE
+        elif placement == "under":
+            y += LABEL_DISTANCE
+        elif placement == "left":
+            x -= LABEL_DISTANCE
+        else:
+            x += LABEL_DISTANCE
+        positions.append((x, y))
+    return positions
+
+
+def create_ruler_store(endpoints) -> RulerStore:
+    rulers = RulerStore()
+    for start, end in endpoints:
+        rulers.add(start, end)
+    return rulers
+
+
+def vectorized_label_positions(endpoints):
+    anchors, directions = ruler_label_anchors(endpoints)
+    return anchors + directions * LABEL_DISTANCE
+
+
+def main():
+    rng = np.random.default_rng(0)
+    failed = False
+    print(f"{'rulers':>8} {'loop (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8}")
+    for num_rulers in NUM_RULERS:
+        endpoints = rng.uniform(MARGIN_RATIO, 1 - MARGIN_RATIO, (num_rulers, 2, 2))
+        rulers = create_ruler_store(endpoints)
+        scale = relative_to_cm_scale(MARGIN_RATIO, BOX_WIDTH, BOX_HEIGHT)
+
+        same_lengths = np.allclose(
+            loop_lengths_cm(endpoints), rulers.lengths(scale)
+        )
+        same_positions = np.allclose(loop_label_positions(endpoints), vectorized_label_positions(endpoints))
+        if not (same_lengths and same_positions):
+            print(f"FAIL {num_rulers} rulers: lengths equal: {same_lengths}, label positions equal: {same_positions}")
+            failed = True
+
+        def loop():
+            loop_lengths_cm(endpoints)
+            loop_label_positions(endpoints)
+
+        def vectorized():
+            rulers.lengths(scale)
+            vectorized_label_positions(rulers.endpoints)
+
+        repeats = max(10000 // num_rulers, 3)
+        loop_ms = 1000 * min(timeit.repeat(loop, number=repeats, repeat=3)) / repeats
+        vectorized_ms = 1000 * min(timeit.repeat(vectorized, number=repeats, repeat=3)) / repeats
+        print(f"{num_rulers:>8} {loop_ms:>12.3f} {vectorized_ms:>16.3f} {loop_ms / vectorized_ms:>7.1f}x")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
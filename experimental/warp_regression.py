@@ -0,0 +1,86 @@
+"""
+Regression check for the single pass warp in fish_mesh.warp_image().
+
+It used to warp to the original image size and then cv2.resize() the result
+to the aspect ratio of the drawn box. This compares the single pass warp with
+that two pass warp on a synthetic image for a few boxes, and fails if they
+differ by more than what is expected from the difference in interpolation.
+
+Run from the project root directory: python experimental/warp_regression.py
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import cv2.cv2 as cv2
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fish_mesh import warp_image  # noqa: E402
+from geometry import reorder_corner_points, get_unskewed_image_size  # noqa: E402
+
+# Max allowed mean absolute difference and fraction of pixels differing by more than 8 (of 255)
+MEAN_ABS_DIFF_TOLERANCE = 1.0
+LARGE_DIFF_FRACTION_TOLERANCE = 0.01
+
+
+def two_pass_warp_image(img, corner_points, rel_margin: float, interpolation: int = cv2.INTER_LINEAR):
+    """The previous implementation of warp_image()"""
+    corner_points = reorder_corner_points(corner_points, "anti-clockwise")
+    img_width = img.shape[1]
+    img_height = img.shape[0]
+    old_corner_points = np.float32(corner_points)
+    new_corner_points = np.float32([
+        [rel_margin * img_width, rel_margin * img_height],
+        [rel_margin * img_width, (1 - rel_margin) * img_height],
+        [(1 - rel_margin) * img_width, (1 - rel_margin) * img_height],
+        [(1 - rel_margin) * img_width, rel_margin * img_height]])
+    matrix = cv2.getPerspectiveTransform(old_corner_points, new_corner_points)
+    img_warped = cv2.warpPerspective(img, matrix, (img_width, img_height), flags=interpolation)
+    new_img_width, new_img_height = get_unskewed_image_size(corner_points, img_width, img_height)
+    return cv2.resize(img_warped, (new_img_width, new_img_height), interpolation=cv2.INTER_AREA)
+
+
+def create_test_image(width: int, height: int):
+    """Smooth color gradients with some blurred shapes (similar frequency content to a photo)"""
+    x = np.linspace(0, 1, width)[None, :]
+    y = np.linspace(0, 1, height)[:, None]
+    img = np.zeros((height, width, 3), np.uint8)
+    img[:, :, 0] = (255 * x * np.ones_like(y)).astype(np.uint8)
+    img[:, :, 1] = (255 * y * np.ones_like(x)).astype(np.uint8)
+    img[:, :, 2] = (127 + 127 * np.sin(8 * x) * np.cos(6 * y)).astype(np.uint8)
+    cv2.rectangle(img, (width // 5, height // 5), (width // 2, height // 2), (255, 255, 255), -1)
+    cv2.circle(img, (2 * width // 3, 2 * height // 3), min(width, height) // 8, (0, 0, 0), -1)
+    return cv2.GaussianBlur(img, (0, 0), sigmaX=4)
+
+
+def main():
+    img = create_test_image(2000, 1500)
+    boxes = [
+        [[300, 200], [300, 1300], [1700, 1300], [1700, 200]],  # axis aligned
+        [[350, 250], [200, 1250], [1800, 1350], [1600, 150]],  # perspective
+        [[800, 100], [700, 1400], [1200, 1400], [1150, 120]],  # tall box
+        [[100, 600], [120, 900], [1900, 950], [1880, 580]],  # wide box
+    ]
+    failed = False
+    for corners in boxes:
+        corner_points = np.array(corners, np.float64)
+        single_pass = warp_image(img, corner_points, 0.05)
+        two_pass = two_pass_warp_image(img, corner_points, 0.05)
+        if single_pass.shape != two_pass.shape:
+            print(f"FAIL {corners}: shape {single_pass.shape} != {two_pass.shape}")
+            failed = True
+            continue
+        diff = np.abs(single_pass.astype(np.int16) - two_pass.astype(np.int16))
+        mean_abs_diff = diff.mean()
+        large_diff_fraction = (diff > 8).mean()
+        ok = mean_abs_diff <= MEAN_ABS_DIFF_TOLERANCE and large_diff_fraction <= LARGE_DIFF_FRACTION_TOLERANCE
+        failed = failed or not ok
+        print(
+            f"{'OK  ' if ok else 'FAIL'} {corners}: shape {single_pass.shape},"
+            f" mean abs diff {mean_abs_diff:.3f}, fraction diff > 8: {large_diff_fraction:.4f}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
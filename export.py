@@ -0,0 +1,288 @@
+import json
+import logging
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+import dacite
+
+from geometry import BoxGeometry, relative_to_cm_scale, rotated_size, rotation_matrix
+from rulers import polyline_length, ruler_label_anchors
+from settings import Settings
+from results_store import COLUMNS, ResultsStore
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+
+logger = logging.getLogger(__name__)
+
+# The full resolution warp used for the saved image favours quality:
+EXPORT_INTERPOLATION = cv2.INTER_CUBIC
+SIDECAR_VERSION = 1
+
+
+class WriteResultFileError(Exception):
+    pass
+
+
+@dataclass
+class ExportRecord:
+    """
+    Everything needed to re-create the exported image and data table of a photo,
+    saved as a JSON sidecar next to them (see write_sidecar()). The draw color and
+    font size are not part of it, so the exports can be re-rendered with other settings.
+    """
+    source_image: str  # path of the measured photo
+    image_file: str  # name of the exported (annotated) image
+    rotation: int  # clockwise quarter turns of the decoded photo (see ImageLoader)
+    corners: List[List[float]]  # (4, 2) box corners relative to the rotated photo
+    margin_ratio: float
+    box_width: float  # cm
+    box_height: float  # cm
+    rulers: List[List[List[float]]]  # vertices of each ruler (in the order drawn), relative to the warped image
+    view_height: int  # height (pixels) of the measurement view when saved, which the label font size is relative to
+    version: int = SIDECAR_VERSION
+
+    def lengths(self) -> List[float]:
+        """Lengths (cm) of the rulers"""
+        scale = relative_to_cm_scale(self.margin_ratio, self.box_width, self.box_height)
+        return [polyline_length(np.array(vertices, np.float64), scale) for vertices in self.rulers]
+
+
+@dataclass
+class ExportJob:
+    record: ExportRecord
+    img: np.ndarray  # full resolution photo (as decoded)
+    settings: Settings
+    image_path: Path
+    sidecar_path: Path
+    results_path: Path  # results store of the session (see ResultsStore)
+    img_info: Dict[str, str]  # image information columns (see ImageMetadata.image_info())
+    data_path: Optional[Path] = None  # workbook of the image, if saved per photo
+    version: int = 0  # version of the measurements that were saved (e.g. of the rulers)
+
+
+@dataclass
+class ExportResult:
+    request_id: int
+    job: ExportJob
+    error: Optional[Exception] = None
+
+
+class ExportWorker:
+    """
+    Writes exports (see export()) in a worker thread, one at a time in the order they
+    were submitted, so the window stays responsive while saving. The jobs only hold
+    snapshots (the record is plain data, and the photo and settings are replaced
+    rather than modified by the window). Results are put on the results queue,
+    which must be read on the tkinter thread (like ImageLoader).
+    """
+    def __init__(self):
+        self.results: "queue.Queue[ExportResult]" = queue.Queue()
+        self._jobs: "queue.Queue[Tuple[int, ExportJob]]" = queue.Queue()
+        self._request_id = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, job: ExportJob) -> int:
+        self._request_id += 1
+        self._jobs.put((self._request_id, job))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self._request_id
+
+    @property
+    def pending(self) -> int:
+        """Number of submitted jobs that aren't done yet"""
+        return self._jobs.unfinished_tasks
+
+    def flush(self):
+        """Wait until all submitted jobs are done (e.g. before exiting, since the worker is a daemon thread)"""
+        self._jobs.join()
+
+    def _run(self):
+        while True:
+            request_id, job = self._jobs.get()
+            try:
+                export(job)
+                self.results.put(ExportResult(request_id, job))
+            except Exception as e:
+                self.results.put(ExportResult(request_id, job, error=e))
+            finally:
+                self._jobs.task_done()
+
+
+def export(job: ExportJob):
+    """Write the exported image, measurements and sidecar of a job"""
+    write_image(job.image_path, render_export(job.img, job.record, job.settings))
+    rows = measurement_rows(job.record, job.img_info)
+    ResultsStore(job.results_path).save(job.record.image_file, rows)
+    if job.data_path is not None:
+        write_table(job.data_path, measurement_table(rows))
+    # (for re-rendering the exports later, see batch_export.py)
+    write_sidecar(job.sidecar_path, job.record)
+
+
+def write_sidecar(path: Path, record: ExportRecord):
+    with open(path, "w") as f:
+        f.write(json.dumps(asdict(record)))
+
+
+def read_sidecar(path: Path) -> ExportRecord:
+    with open(path) as f:
+        return dacite.from_dict(ExportRecord, json.loads(f.read()), config=dacite.Config(strict=True))
+
+
+def render_export(img, record: ExportRecord, settings: Settings):
+    """
+    Warp the full resolution photo img (as decoded, i.e. before the rotation of
+    the record), and draw the rulers, ruler labels and box on it.
+    """
+    image_size = rotated_size((img.shape[1], img.shape[0]), record.rotation)
+    box_geometry = BoxGeometry.from_corners(
+        np.array(record.corners, np.float64) * image_size, image_size, record.margin_ratio
+    )
+    # The warped image is only built here, and is annotated in place:
+    save_image = box_geometry.warp(
+        img,
+        interpolation=EXPORT_INTERPOLATION,
+        source_transform=rotation_matrix(record.rotation, (img.shape[1], img.shape[0])),
+    )
+    img_width = save_image.shape[1]
+    img_height = save_image.shape[0]
+
+    font_scale = int(np.ceil(export_font_scale(settings.font_size, record.view_height, img_height)))
+    bgr = hex_color_to_bgr(settings.draw_color)  # images are kept in the BGR order used by OpenCV
+    point_radii = max(int(settings.point_size / 2), 1)
+    ruler_values = record.lengths()
+    if record.rulers:
+        endpoints = np.array([[vertices[0], vertices[-1]] for vertices in record.rulers], np.float64)
+        anchors, directions = ruler_label_anchors(endpoints)
+        # TODO: maybe used max(font_size, point_radii) * 3 as distance measure to place text relative to point
+        label_positions = anchors * (img_width, img_height) + directions * (point_radii * 3)
+    for i, vertices in enumerate(record.rulers):
+        # draw lines
+        points = (np.array(vertices, np.float64) * (img_width, img_height)).astype(np.int32)
+        if len(points) > 2:
+            cv2.polylines(save_image, [points], isClosed=False, color=bgr, thickness=1, lineType=cv2.LINE_4)
+        else:
+            p0, p1 = tuple(points[0].tolist()), tuple(points[1].tolist())
+            cv2.line(save_image, p0, p1, color=bgr, thickness=1, lineType=cv2.LINE_4)
+
+        lbl_x, lbl_y = label_positions[i]
+        cv2.putText(
+            img=save_image,
+            text=f"{i + 1}: {ruler_values[i]:.1f} cm",
+            org=(int(lbl_x), int(lbl_y)),
+            fontFace=cv2.FONT_HERSHEY_DUPLEX,  # cv2.FONT_HERSHEY_SIMPLEX,
+            fontScale=font_scale,
+            thickness=font_scale,
+            color=bgr,
+        )
+
+    # Draw bounding box
+    min_x = int(record.margin_ratio * img_width)
+    min_y = int(record.margin_ratio * img_height)
+    max_x = int((1 - record.margin_ratio) * img_width)
+    max_y = int((1 - record.margin_ratio) * img_height)
+    # draw lines: top_left, top_right, bottom_right, bottom_left:
+    cv2.line(save_image, (min_x, min_y), (min_x, max_y), color=bgr, thickness=1, lineType=cv2.LINE_4)
+    cv2.line(save_image, (min_x, max_y), (max_x, max_y), color=bgr, thickness=1, lineType=cv2.LINE_4)
+    cv2.line(save_image, (max_x, max_y), (max_x, min_y), color=bgr, thickness=1, lineType=cv2.LINE_4)
+    cv2.line(save_image, (max_x, min_y), (min_x, min_y), color=bgr, thickness=1, lineType=cv2.LINE_4)
+    return save_image
+
+
+def measurement_rows(record: ExportRecord, img_info: Dict) -> List[Dict]:
+    """
+    One row per ruler, with the image name and information (see ImageMetadata.image_info(),
+    so data can be mapped back to file), the box dimensions and the length
+    """
+    return [
+        dict(
+            image_file=record.image_file,
+            **img_info,
+            box_width_cm=record.box_width,
+            box_height_cm=record.box_height,
+            measurement_id=i + 1,
+            length_cm=value,
+        )
+        for i, value in enumerate(record.lengths())
+    ]
+
+
+def measurement_table(rows: List[Dict]) -> "DataFrame":
+    from pandas import DataFrame  # (slow to import, and only needed when saving, see preload_export_modules())
+
+    return DataFrame(rows, columns=COLUMNS)
+
+
+def write_image(path: Path, img):
+    cv2.imwrite(filename=str(path), img=img)
+    if not path.exists():
+        raise WriteResultFileError(
+            f"No output image produced for {path}."
+        )
+
+
+def write_table(path: Path, df: "DataFrame"):
+    # Save excel file with the same name as image filename:
+    df.to_excel(str(path), index=False, float_format="%.1f")
+    if not path.exists():
+        raise WriteResultFileError(
+            f"No output excel file produced for {path}."
+        )
+
+
+def export_font_scale(font_size: int, view_height: int, warped_height: int) -> float:
+    """
+    Get the size of the font to be drawn on the warped full resolution image
+    from the font size drawn on the screen (on the resized image of view_height)
+    """
+    # get font size relative to resized image
+    img_relative_font_size = font_size / max(view_height, 1)  # both are in pixels
+
+    # Get the number of pixels this represents on the full resolution image
+    scaled_font_size = img_relative_font_size * warped_height
+
+    # Correct any differences in font size between tkinter and cv2
+    return scaled_font_size * font_scale_correction(font_size)
+
+
+def font_scale_correction(font_size: int, cv2_font=cv2.FONT_HERSHEY_DUPLEX) -> float:
+    """
+    Get correction for the size of a font relative to the
+    size of the cv2 font with fontScale=1, thickness=1
+    """
+    cv2_text_height = cv2.getTextSize(text="A", fontFace=cv2_font, fontScale=font_size, thickness=font_size)[0][1]
+    return font_size / cv2_text_height
+
+
+def hex_color_to_rgb(hex: str) -> Tuple[int, int, int]:
+    _hex = hex.lstrip("#")
+    r = int(_hex[0:2], 16)
+    g = int(_hex[2:4], 16)
+    b = int(_hex[4:6], 16)
+    return r, g, b
+
+
+def hex_color_to_bgr(hex: str) -> Tuple[int, int, int]:
+    r, g, b = hex_color_to_rgb(hex)
+    return b, g, r
+
+
+def preload_export_modules():
+    """
+    Import the modules that are only needed for saving (pandas), e.g. in a
+    background thread once the window is shown, so neither startup nor the first
+    save has to wait for them
+    """
+    start_time = time.perf_counter()
+    import pandas  # noqa: F401
+    logger.info(f"Preloaded export modules in {(time.perf_counter() - start_time) * 1000:.0f} ms")
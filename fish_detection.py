@@ -0,0 +1,121 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+
+from image_loader import create_preview_image
+
+
+logger = logging.getLogger(__name__)
+
+# Detection runs on a copy of the warped image downscaled to at most this size:
+DETECTION_SIZE = 800
+# Fish are blobs differing from the board by at least this much (distance in Lab color space),
+MIN_COLOR_DIFFERENCE = 25.0
+# covering this fraction of the box,
+MIN_FISH_AREA_RATIO = 0.0005
+MAX_FISH_AREA_RATIO = 0.5
+# and at least this many times longer than wide (this also rejects e.g. markers and labels on the board):
+MIN_ELONGATION = 2.5
+
+
+@dataclass
+class FishDetection:
+    request_id: int
+    version: int  # version of the image the detection was run on (e.g. the warped preview)
+    endpoints: Optional[np.ndarray] = None  # (n, 2, 2) relative to the image size
+    error: Optional[Exception] = None
+
+
+class FishDetector:
+    """
+    Detects fish in a warped image in a worker thread, so the window stays
+    responsive. Results are put on the results queue, which must be read on
+    the tkinter thread (like ImageLoader).
+    """
+    def __init__(self):
+        self.results: "queue.Queue[FishDetection]" = queue.Queue()
+        self._request_id = 0
+
+    def detect(self, img, version: int, margin_ratio: float, box_size: Tuple[float, float]) -> int:
+        self._request_id += 1
+        threading.Thread(
+            target=self._detect, args=(self._request_id, img, version, margin_ratio, box_size), daemon=True
+        ).start()
+        return self._request_id
+
+    def is_current(self, result: FishDetection) -> bool:
+        """False for results of a detection that has been replaced by a newer one"""
+        return result.request_id == self._request_id
+
+    def _detect(self, request_id: int, img, version: int, margin_ratio: float, box_size: Tuple[float, float]):
+        try:
+            endpoints = detect_fish(img, margin_ratio, box_size)
+            self.results.put(FishDetection(request_id, version, endpoints))
+        except Exception as e:
+            self.results.put(FishDetection(request_id, version, error=e))
+
+
+def detect_fish(img, margin_ratio: float, box_size: Tuple[float, float]) -> np.ndarray:
+    """
+    Find fish lying in the box of a warped image (see BoxGeometry), and estimate
+    the total length of each as the extent of the fish along its principal axis.
+
+    The board is taken to be the median color inside the box, and fish are
+    elongated blobs of a different color with their center inside the box.
+    box_size: (width, height) of the box in cm, so the principal axes are found
+    in physical units (the warped image might be scaled differently along x and y).
+    Returns the (n, 2, 2) endpoints of the fish relative to the image size (inside the box).
+    """
+    small = create_preview_image(img, DETECTION_SIZE)
+    img_height, img_width = small.shape[:2]
+    min_x, max_x = int(margin_ratio * img_width), int((1 - margin_ratio) * img_width)
+    min_y, max_y = int(margin_ratio * img_height), int((1 - margin_ratio) * img_height)
+    box_area = max((max_x - min_x) * (max_y - min_y), 1)
+
+    lab = cv2.cvtColor(cv2.GaussianBlur(small, (5, 5), 0), cv2.COLOR_BGR2LAB).astype(np.float32)
+    # (a subsample of the box is enough for the median)
+    board_color = np.median(lab[min_y:max_y:4, min_x:max_x:4].reshape((-1, 3)), axis=0)
+    difference = np.linalg.norm(lab - board_color, axis=2)
+    mask = (difference > MIN_COLOR_DIFFERENCE).astype(np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(mask)
+
+    # cm per pixel along x and y:
+    scale = np.array([
+        box_size[0] / max(max_x - min_x, 1),
+        box_size[1] / max(max_y - min_y, 1),
+    ])
+    fish_endpoints = []
+    for label in range(1, num_labels):  # (0 is the background)
+        area = stats[label, cv2.CC_STAT_AREA]
+        center_x, center_y = centroids[label]
+        if not (MIN_FISH_AREA_RATIO * box_area <= area <= MAX_FISH_AREA_RATIO * box_area):
+            continue
+        if not (min_x <= center_x <= max_x and min_y <= center_y <= max_y):
+            continue
+        left, top = stats[label, cv2.CC_STAT_LEFT], stats[label, cv2.CC_STAT_TOP]
+        width, height = stats[label, cv2.CC_STAT_WIDTH], stats[label, cv2.CC_STAT_HEIGHT]
+        ys, xs = np.nonzero(labels[top:top + height, left:left + width] == label)
+        points = np.stack([xs + left, ys + top], axis=1) * scale
+        center = points.mean(axis=0)
+        # Principal axes (eigenvectors of the covariance, in ascending order of variance):
+        variances, axes = np.linalg.eigh(np.cov((points - center).T))
+        if variances[0] <= 0 or np.sqrt(variances[1] / variances[0]) < MIN_ELONGATION:
+            continue
+        axis = axes[:, 1]
+        projections = (points - center) @ axis
+        endpoints = center + np.outer([projections.min(), projections.max()], axis)
+        fish_endpoints.append(endpoints / scale)
+    logger.info(f"Detected {len(fish_endpoints)} fish")
+    if not fish_endpoints:
+        return np.zeros((0, 2, 2))
+    # (pixel centers to relative coordinates, kept inside the box like drawn rulers)
+    endpoints = (np.array(fish_endpoints) + 0.5) / (img_width, img_height)
+    return np.clip(endpoints, margin_ratio, 1 - margin_ratio)
@@ -1,42 +1,75 @@
 #!/usr/bin/env python
+import time
+STARTUP_TIME = time.perf_counter()  # (see FishMesh.log_startup_report())
+
+from startup import ImportTimer, startup_report
+import_timer = ImportTimer()
+import_timer.start()
+
 import logging
 import re
 from datetime import datetime
 from typing import List, Optional, Dict, Tuple
 from tkinter import *
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import tkinter as tk
 from pathlib import Path
 from dataclasses import dataclass
 import numpy as np
+import os
+import queue
+import threading
+import multiprocessing
 from functools import partial
-from copy import deepcopy
 
-import exif
 import cv2.cv2 as cv2
 from PIL import ImageTk, Image
-from pandas import DataFrame
 import dacite
 
 from settings import Settings, SettingsError, DEFAULT_SETTINGS_PATH
 from settings_dialog import SettingsDialog
+from overlay import CanvasOverlay
+from scheduler import RedrawScheduler
+from geometry import (
+    BoxGeometry, reorder_corner_points, relative_to_cm_scale,
+    rotate_image, rotate_relative_points, rotated_size, rotation_matrix,
+)
+from image_loader import ImageLoader, LoadedImage
+from memory import fit_to_memory_budget, log_peak_rss
+from rulers import RulerStore, ruler_label_anchors
+from hit_test import PointIndex
+from box_detection import detect_marker_box, detect_reference_box, refine_corner
+from edges import EdgeMap
+from fish_detection import FishDetection, FishDetector
+from export import ExportJob, ExportRecord, ExportResult, ExportWorker, preload_export_modules
+from image_metadata import ImageMetadata
+from results_store import RESULTS_DATABASE_NAME
+from photo_queue import PhotoQueue
+from prefetch import Prefetcher, read_prefetch
+import_timer.stop()
 
 
-logging.basicConfig(filename='logs.log',
-                    filemode='w',
-                    level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-
-class WriteResultFileError(Exception):
-    pass
+# Previews (shown on screen and warped while dragging) favour speed
+# (see export.EXPORT_INTERPOLATION for the saved image):
+PREVIEW_INTERPOLATION = cv2.INTER_LINEAR
+LOAD_POLL_INTERVAL_MS = 50
+SHIFT_MASK = 0x0001  # (event.state)
+# Clicks up to this many pixels outside a drawn point still select it:
+HIT_HALO = 10
+# Released box corners (and ruler endpoints) are snapped to an image corner (edge)
+# within this many pixels (on screen):
+SNAP_RADIUS = 8
 
 
 @dataclass
 class ImageView:
     img = None
+    img_version = None  # changes whenever img is replaced (load, rotation, warp)
     canvas = None  # canvas to draw on
     canvas_img = None
+    overlay: Optional[CanvasOverlay] = None  # points, lines and labels drawn on top of the image
 
     # Padding to preserve aspect ratio (centered image)
     x_padding = None
@@ -45,18 +78,17 @@ class ImageView:
     resized_img = None
     resized_width = None
     resized_height = None
+    # (img_version, canvas_width, canvas_height) that resized_img was built for:
+    resized_key = None
 
     points = None
-    drawn_points = None
-    lines = None
-    drawn_lines = None
+    drawn_points: Optional[PointIndex] = None  # canvas positions of the drawn (draggable) points, by overlay key
 
 
 @dataclass
 class Point:
     x: float
     y: float
-    ruler_id: Optional[int] = None
     color: Optional[str] = None
     drawing_id: Optional[int] = None
 
@@ -71,6 +103,7 @@ class RelativeComponent:
 class FishMesh:
     def __init__(self, settings: Optional[Settings] = None):
         logger.info("Starting program")
+        init_start_time = time.perf_counter()
         self.window = tk.Tk()
         self.window.title('fish-mesh')
         self.window.config(background="white")
@@ -119,7 +152,33 @@ class FishMesh:
         )
         # self.input_file_explorer_button.pack(side=LEFT, fill="x", expand=True)
         self.input_file_explorer_button.pack(side=tk.LEFT)
+        self.open_folder_button = Button(
+            self.top_menu,
+            bg="white",
+            text="Open Folder",
+            command=self.open_folder,
+        )
+        self.open_folder_button.pack(side=tk.LEFT)
+        # Folder work queue (see open_folder()), with the next photos decoded in the background:
+        self.photo_queue: Optional[PhotoQueue] = None
+        self.prefetcher = Prefetcher(max_workers=max(min(self.settings.prefetch_count, os.cpu_count() or 1), 1))
+        self.queue_menu = tk.Frame(self.top_menu, background="white")
+        self.previous_photo_button = Button(
+            self.queue_menu, bg="white", text="\u25C0", command=partial(self.go_to_photo, -1)
+        )
+        self.previous_photo_button.pack(side=tk.LEFT)
+        self.queue_status_label = tk.Label(self.queue_menu, text="", bg="white")
+        self.queue_status_label.pack(side=tk.LEFT)
+        self.next_photo_button = Button(
+            self.queue_menu, bg="white", text="\u25B6", command=partial(self.go_to_photo, 1)
+        )
+        self.next_photo_button.pack(side=tk.LEFT)
         self.selected_input_file = None
+        self.image_metadata = ImageMetadata()  # EXIF metadata of the selected file (read when loading it)
+        # Images are decoded in the background (see poll_image_loader()):
+        self.image_loader = ImageLoader()
+        self.loading_file = None
+        self.loading_progress = ttk.Progressbar(self.top_menu, mode="determinate", maximum=2, length=100)
         self.settings_button = Button(
             self.top_menu,
             bg="white",
@@ -131,19 +190,32 @@ class FishMesh:
         )
         self.settings_button.pack(side=tk.RIGHT)
 
-        self.img = None
-        self.warped_image = None
+        self.img = None  # full resolution image (None until decoded)
+        # Rotation of the shown image (clockwise quarter turns). The full resolution
+        # image is never rotated, instead the rotation is included in the warp when saving:
+        self.rotation = 0
+        self.image_size: Optional[Tuple[int, int]] = None  # (width, height) of the full resolution image (rotated)
+        # Downscaled copy of img (screen resolution) used for displaying and warping while drawing:
+        self.preview_img = None
+        self.warped_preview = None
+        # Perspective correction of the box (see get_box_geometry()):
+        self.box_geometry: Optional[BoxGeometry] = None
+        self.box_geometry_inputs = None
+        # Bumped whenever the preview arrays are replaced, so cached previews can be reused until then:
+        self.img_version = 0
+        self.warped_preview_version = 0
+        # Gradient of the warped preview for snapping ruler endpoints (see get_edge_map()):
+        self.edge_map: Optional[EdgeMap] = None
+        self.edge_map_version = None
         self.output_dir = None
 
-        self.dragged_point: Optional[Point] = None
-
-        self.measure_box_lines = []
+        # Overlay key of the dragged point, ("corner", i) or ("ruler_point", ruler_id, vertex):
+        self.dragged_point: Optional[Tuple] = None
 
+        # Rulers (relative to the warped image) of the current image:
+        self.rulers = RulerStore()
         self.new_ruler_start_point = None
-        self.drawn_ruler_end = None
-        self.drawn_ruler_line = None
-        self.num_rulers_created = 0
-        self.drawn_ruler_labels = []
+        self.new_ruler_vertices: List[Point] = []  # vertices added (shift+click) to a curved ruler being drawn
 
         self.image_displays = tk.Frame(self.window)
         self.image_displays.pack(fill="both", expand=True)
@@ -151,8 +223,10 @@ class FishMesh:
         self.left_view.canvas = Canvas(self.image_displays, width=0, height=0, bg="white")
         # self.left_view.canvas.pack(side=LEFT, fill="both", expand=True)
         self.left_view.canvas.pack(fill="both", expand=True)
+        self.left_view.overlay = CanvasOverlay(self.left_view.canvas)
         self.right_view = ImageView()
         self.right_view.canvas = Canvas(self.image_displays, width=0, height=0, bg="white")
+        self.right_view.overlay = CanvasOverlay(self.right_view.canvas)
         # self.right_view.canvas.pack(side=RIGHT, fill="both", expand=True)
         self.in_box_drawing_window = True
         self.mini_window_spec = RelativeComponent(x=0.8, y=0.0, w=0.2, h=0.2)
@@ -178,7 +252,15 @@ class FishMesh:
         self.toggle_mini_window_button.pack(side=tk.RIGHT)
 
 
-        self.window.bind('<Configure>', self.resize_callback)
+        # Redraws and warps are coalesced into at most one render per frame (see draw()):
+        self.redraw_scheduler = RedrawScheduler(self.window)
+        self.redraw_scheduler.register("warp", self.warp_image, self.warp_inputs)
+        self.redraw_scheduler.register("left", self.draw_left_view, partial(self.view_inputs, self.left_view))
+        self.redraw_scheduler.register("right", self.draw_right_view, partial(self.view_inputs, self.right_view))
+
+        # Only the canvases matter when resizing (the window also receives <Configure> of all its children)
+        self.left_view.canvas.bind('<Configure>', partial(self.resize_callback, self.left_view))
+        self.right_view.canvas.bind('<Configure>', partial(self.resize_callback, self.right_view))
 
         """
         mouse-button  click      hold&move    release
@@ -249,44 +331,200 @@ class FishMesh:
             # highlightthickness=0,
             # bd=0
         )
-        self.saved_points: Optional[List[Point]] = None
+        self.detect_fish_button = Button(
+            self.top_menu,
+            text="Detect fish",
+            command=self.detect_fish,
+            bg="white",
+        )
+        # Fish are detected in the background (see poll_fish_detector()):
+        self.fish_detector = FishDetector()
+        self.detecting_fish = False
+        self.saved_rulers_version: Optional[int] = None
         self.output_folder = Path.cwd().__str__()
+        # Exports are written in the background (see poll_export_worker()):
+        self.export_worker = ExportWorker()
+        self.polling_export_worker = False
+        self.saving_label = tk.Label(self.top_menu, text="", bg="white")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.startup_steps = [("window setup", time.perf_counter() - init_start_time)]
 
     def select_and_load_file(self):
         selected_file = self.select_file()
         if selected_file:
             self.input_folder = Path(selected_file).parent
+            if not self.confirm_new_image():
+                return
+            if self.photo_queue is not None:
+                # (leave the folder)
+                self.photo_queue = None
+                self.queue_menu.pack_forget()
+                self.prefetcher.prefetch([], 0)
+            self.load_file(selected_file)
+
+    def confirm_new_image(self) -> bool:
+        if len(self.rulers) and self.rulers.version != self.saved_rulers_version:
+            # TODO: make a configuration to not get warning before opening
+            return messagebox.askyesno(
+                "Load new image?",
+                "Opening a new image will end the current session and reset measurements."
+            )
+        return True
+
+    def load_file(self, path: str):
+        # Decode in the background; a reduced scale preview is shown
+        # as soon as it's ready, and the full resolution image follows
+        # (right away if the image has been prefetched, or as soon as its prefetch is done):
+        preview_size = max(self.window.winfo_screenwidth(), self.window.winfo_screenheight())
+        prefetch = self.prefetcher.take(path)
+        prefetched = None if prefetch is None else partial(read_prefetch, prefetch, self.settings.memory_budget_mb)
+        self.image_loader.load(path, preview_size, self.settings.memory_budget_mb, prefetched)
+        if self.loading_file is None:
+            self.window.after(LOAD_POLL_INTERVAL_MS, self.poll_image_loader)
+        self.loading_file = path
+        self.loading_progress.configure(value=0)
+        self.loading_progress.pack(side=tk.LEFT)
+
+    def open_folder(self):
+        """Work through the photos of a folder, one at a time (see PhotoQueue)"""
+        folder = filedialog.askdirectory(initialdir=self.input_folder, title="Select a folder of photos")
+        if not folder:
+            return
+        photo_queue = PhotoQueue(Path(folder))
+        if not len(photo_queue):
+            messagebox.showinfo("No photos", f"No photos found in {folder}")
+            return
+        if not self.confirm_new_image():
+            return
+        logger.info(f"Opened folder {folder} with {len(photo_queue)} photos")
+        self.photo_queue = photo_queue
+        self.input_folder = folder
+        self.queue_menu.pack(side=tk.LEFT)
+        self.load_queue_photo()
+
+    def go_to_photo(self, step: int):
+        """Move step photos forward (or back) in the folder, skipping the current photo if not saved"""
+        if self.photo_queue is None or not self.confirm_new_image():
+            return
+        current = self.photo_queue.current
+        if not self.photo_queue.move(step):
+            return
+        if step > 0 and self.photo_queue.status(current) == "todo":
+            self.photo_queue.set_status(current, "skipped")
+        self.load_queue_photo()
+
+    def load_queue_photo(self):
+        self.load_file(str(self.photo_queue.current))
+        # Decode the photos likely to be opened next while this one is measured:
+        preview_size = max(self.window.winfo_screenwidth(), self.window.winfo_screenheight())
+        self.prefetcher.prefetch(
+            [str(path) for path in self.photo_queue.upcoming(self.settings.prefetch_count)],
+            preview_size,
+            self.settings.memory_budget_mb,
+        )
+        self.show_queue_status()
 
-            if self.right_view.points is not None and self.right_view.points != self.saved_points:
-                # TODO: make a configuration to not get warning before opening
-                answered_yes = messagebox.askyesno(
-                    "Load new image?",
-                    "Opening a new image will end the current session and reset measurements."
-                )
-                if not answered_yes:
-                    return
-            try:
-                self.img = self.load_image(selected_file)
-            except Exception as e:
-                messagebox.showerror(
-                    "Image File Error",
-                    "Could not load image. Make sure the selected file is an image file."
-                )
-                logger.error(
-                    f"Encountered error while trying to load image from the selected file {repr(selected_file)}:"
-                )
-                logger.exception(e)
-            else:
-                logger.info("Successfully loaded image file")
-                self.selected_input_file = selected_file
-                # Clear any potential drawings from a previous image:
-                self.clear_all_drawings()
-                # Move to the bounding box drawing view:
-                self.go_to_box_drawing_window()
-                # After file has loaded, show image, and draw initial bounding box and warped image
-                self.init_bounding_box(self.left_view)
-                self.warp_image()
-                self.draw()
+    def show_queue_status(self):
+        if self.photo_queue is None:
+            return
+        self.queue_status_label.configure(
+            text=f"{self.photo_queue.current.name} [{self.photo_queue.status(self.photo_queue.current)}]"
+                 f" {self.photo_queue.summary()}"
+        )
+
+    def poll_image_loader(self):
+        try:
+            while True:
+                loaded = self.image_loader.results.get_nowait()
+                try:
+                    self.handle_loaded_image(loaded)
+                except Exception as e:
+                    # (e.g. while showing the preview; reported like a decode error, so a file can be selected again)
+                    if self.image_loader.is_current(loaded):
+                        self.handle_loaded_image(LoadedImage(loaded.request_id, loaded.path, "error", error=e))
+                        self.image_loader.cancel()  # (the rest of the load is of no use)
+        except queue.Empty:
+            pass
+        finally:
+            if self.loading_file is not None:
+                self.window.after(LOAD_POLL_INTERVAL_MS, self.poll_image_loader)
+
+    def handle_loaded_image(self, loaded: LoadedImage):
+        if not self.image_loader.is_current(loaded):
+            return  # replaced by a newer selected file
+        if loaded.stage == "error":
+            self.loading_file = None
+            self.loading_progress.pack_forget()
+            messagebox.showerror(
+                "Image File Error",
+                "Could not load image. Make sure the selected file is an image file."
+            )
+            logger.error(
+                f"Encountered error while trying to load image from the selected file {repr(loaded.path)}:"
+            )
+            logger.exception(loaded.error)
+        elif loaded.stage == "preview":
+            self.set_preview_image(loaded.img, loaded.image_size, loaded.rotation)
+            self.selected_input_file = loaded.path
+            self.image_metadata = loaded.metadata
+            logger.info(f"Image metadata: {loaded.metadata}")
+            # Clear any potential drawings from a previous image:
+            self.clear_all_drawings()
+            # Move to the bounding box drawing view:
+            self.go_to_box_drawing_window()
+            # After file has loaded, show image, and draw initial bounding box and warped image
+            self.init_bounding_box(self.left_view)
+            self.draw()
+            self.loading_progress.configure(value=1)
+        elif loaded.stage == "full":
+            logger.info("Successfully loaded image file")
+            self.img = loaded.img
+            self.image_size = rotated_size(loaded.image_size, self.rotation)
+            self.loading_file = None
+            self.loading_progress.pack_forget()
+            log_peak_rss("after loading image")
+            self.draw()
+
+    def detect_fish(self):
+        """Propose rulers for the fish in the box (detected in the background)"""
+        self.redraw_scheduler.flush()  # make sure a pending warp is done
+        if self.warped_preview is None:
+            return
+        self.fish_detector.detect(
+            self.warped_preview,
+            self.warped_preview_version,
+            self.margin_ratio,
+            (self.settings.measure_box_width, self.settings.measure_box_height),
+        )
+        if not self.detecting_fish:
+            self.window.after(LOAD_POLL_INTERVAL_MS, self.poll_fish_detector)
+        self.detecting_fish = True
+        self.detect_fish_button.configure(state=tk.DISABLED)
+
+    def poll_fish_detector(self):
+        try:
+            while True:
+                self.handle_fish_detection(self.fish_detector.results.get_nowait())
+        except queue.Empty:
+            pass
+        if self.detecting_fish:
+            self.window.after(LOAD_POLL_INTERVAL_MS, self.poll_fish_detector)
+
+    def handle_fish_detection(self, detection: FishDetection):
+        if not self.fish_detector.is_current(detection):
+            return  # replaced by a newer detection
+        self.detecting_fish = False
+        self.detect_fish_button.configure(state=tk.NORMAL)
+        if detection.error is not None:
+            logger.error("Encountered error while trying to detect fish:")
+            logger.exception(detection.error)
+            return
+        if detection.version != self.warped_preview_version:
+            return  # the box (or image) has changed since
+        # The proposed rulers are regular rulers, which can be adjusted or deleted:
+        for start, end in detection.endpoints.tolist():
+            self.rulers.add(start, end)
+        self.draw("right")
 
     def select_file(self):
         """opening file explorer window"""
@@ -306,12 +544,11 @@ class FishMesh:
         # 1) Delete stored drawings from canvas:
         clear_drawings(self.left_view)
         clear_drawings(self.right_view)
-        self.clear_ruler_label_drawings()
+        self.redraw_scheduler.invalidate()
         # 2) Clear containers storing the drawing references:
-        self.right_view.points = None
-        self.right_view.lines = None
-        self.num_rulers_created = 0
-        self.drawn_ruler_labels = []
+        self.rulers.clear()
+        self.new_ruler_start_point = None
+        self.new_ruler_vertices = []
 
     def change_settings(self):
         dialog = SettingsDialog(title="Settings", parent=self.window, settings=self.settings)
@@ -326,30 +563,19 @@ class FishMesh:
             self.update_program_with_new_settings(old_settings)
 
     def update_program_with_new_settings(self, old_settings: Settings):
-        self.point_radii = max(int(self.settings.point_size / 2), 1)
-        self.margin_ratio = self.settings.measure_box_margin_percentage / 100
         # settings might change properties related to the bounding box.
         # Since ruler points doesn't know about the margin, we need to
-        # rescale all the drawn rulers:
+        # move all the drawn rulers to the same position in the new warped image:
+        old_box_geometry = self.get_box_geometry() if self.preview_img is not None else None
+        self.point_radii = max(int(self.settings.point_size / 2), 1)
+        self.margin_ratio = self.settings.measure_box_margin_percentage / 100
         if self.img is not None:
-            self.warp_image()
-        if self.right_view.points is not None:
-            old_margin_ratio = old_settings.measure_box_margin_percentage / 100
-            new_margin_ratio = self.settings.measure_box_margin_percentage / 100
-            scaling = (1 - 2 * new_margin_ratio) / ( 1 - 2 * old_margin_ratio)
-            for i, p in enumerate(self.right_view.points):
-                # get coordinates of points relativee to center of image
-                # (in order to scale rulers relative to the center of the image):
-                cpx = p.x - 0.5
-                cpy = p.y - 0.5
-                # scale:
-                scpx = cpx * scaling
-                scpy = cpy * scaling
-                # translate coordinates back to original origin:
-                spx = scpx + 0.5
-                spy = scpy + 0.5
-                self.right_view.points[i].x = spx
-                self.right_view.points[i].y = spy
+            self.img = fit_to_memory_budget(self.img, self.settings.memory_budget_mb)
+        if len(self.rulers) and old_box_geometry is not None:
+            new_box_geometry = self.get_box_geometry()
+            old_positions = self.rulers.all_vertices()
+            new_positions = new_box_geometry.image_to_relative(old_box_geometry.relative_to_image(old_positions))
+            self.rulers.set_all_vertices(new_positions)
         self.draw()
 
     def get_default_filename(self, exif_datetime_str: Optional[str] = None) -> str:
@@ -372,8 +598,7 @@ class FishMesh:
             return datetime.utcnow().strftime(filename_datetime_format)
 
     def choose_save_file(self) -> Optional[str]:
-        exif_info: Dict = get_image_exif_info(self.selected_input_file)
-        default_file_name = self.get_default_filename(exif_info["image_datetime"])
+        default_file_name = self.get_default_filename(self.image_metadata.datetime)
         file_handle = filedialog.asksaveasfile(
             initialdir=self.output_folder,
             initialfile=default_file_name,
@@ -385,26 +610,33 @@ class FishMesh:
             Path(filename).unlink()
             return filename
 
-    def load_image(self, image_file):
-        img_array_BGR = cv2.imread(image_file)
-
-        # OpenCV uses BGR color, but PIL expects RGB, so we need to convert image's color to RGB order
-        img_array_RGB = cv2.cvtColor(img_array_BGR, cv2.COLOR_BGR2RGB)
-
-        return img_array_RGB
-
-    def resize_views(self):
-        if self.left_view.img is not None:
-            img, w, h = self.resize_image(self.left_view.img, self.left_view.canvas)
-            self.left_view.resized_img = img
-            self.left_view.resized_width = w
-            self.left_view.resized_height = h
-
-        if self.right_view.img is not None:
-            img, w, h = self.resize_image(self.right_view.img, self.right_view.canvas)
-            self.right_view.resized_img = img
-            self.right_view.resized_width = w
-            self.right_view.resized_height = h
+    def set_preview_image(self, preview_img, image_size: Tuple[int, int], rotation: int = 0):
+        """
+        Start showing a new image (the full resolution img is set when it's available)
+        preview_img: already rotated
+        image_size: size of the (unrotated) full resolution image
+        """
+        self.img = None
+        self.rotation = rotation
+        self.image_size = rotated_size(image_size, rotation)
+        self.preview_img = preview_img
+        self.img_version += 1
+        self.warped_preview = None
+        self.box_geometry = None
+
+    def resize_view(self, img_view: ImageView):
+        if img_view.img is None:
+            return
+        # Resizing the full resolution image is expensive, so only do it
+        # when either the image or the size of the canvas has changed:
+        key = (img_view.img_version, img_view.canvas.winfo_width(), img_view.canvas.winfo_height())
+        if key == img_view.resized_key:
+            return
+        img, w, h = self.resize_image(img_view.img, img_view.canvas)
+        img_view.resized_img = img
+        img_view.resized_width = w
+        img_view.resized_height = h
+        img_view.resized_key = key
 
     def resize_image(self, img, canvas: tk.Canvas, preserve_aspect_ratio=True):
         img_width = len(img[0])
@@ -433,7 +665,9 @@ class FishMesh:
             resized = cv2.resize(img, (canvas_width, canvas_height), interpolation=cv2.INTER_AREA)
             resized_width = canvas_width
             resized_height = canvas_height
-        resized_img = ImageTk.PhotoImage(Image.fromarray(resized))
+        # Images are kept in the BGR order used by OpenCV, but PIL expects RGB
+        # (converting here only touches the small resized image):
+        resized_img = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)))
         return resized_img, resized_width, resized_height
 
     def draw_image(self, img_view):
@@ -442,49 +676,99 @@ class FishMesh:
         # Get x,y position to center image drawn on canvas using anchor to NW
         x = (img_view.canvas.winfo_width() - img_view.resized_width) // 2
         y = (img_view.canvas.winfo_height() - img_view.resized_height) // 2
-        img_view.canvas_img = img_view.canvas.create_image(x, y, image=img_view.resized_img, anchor=tk.NW)  # TODO: should i delete the previous image on canvas? (not sure I'm using this variable at all)
         # The position is equal to the "padding" (on one side) required to preserve aspect ratio
         img_view.x_padding = x
         img_view.y_padding = y
-        img_view.canvas.itemconfig(img_view.canvas_img, image=img_view.resized_img)
-        img_view.canvas.image = img_view.resized_img
-        img_view.canvas.configure(bg="black")
-
-    def draw(self):
-        if self.img is None:
+        if img_view.canvas_img is None:
+            img_view.canvas_img = img_view.canvas.create_image(x, y, image=img_view.resized_img, anchor=tk.NW)
+            img_view.canvas.configure(bg="black")
+        elif img_view.canvas.image is not img_view.resized_img:
+            img_view.canvas.coords(img_view.canvas_img, x, y)
+            img_view.canvas.itemconfig(img_view.canvas_img, image=img_view.resized_img)
+        else:
+            # Same cached preview as last draw, so only the overlay needs to be redrawn
             return
-        self.left_view.img = self.img
-        self.right_view.img = self.warped_image
+        # Keep the image below the drawn points and lines:
+        img_view.canvas.tag_lower(img_view.canvas_img)
+        img_view.canvas.image = img_view.resized_img  # keep reference (avoid garbage collection)
 
-        self.resize_views()
+    def draw(self, *parts: str):
+        """
+        Request a redraw of the given parts ("warp", "left", "right"; default: all).
+        The drawing happens in the next frame, where all requests since the
+        previous frame are merged and parts with unchanged inputs are skipped.
+        """
+        self.redraw_scheduler.request(*parts)
 
+    def redraw_part(self, img_view: ImageView) -> str:
+        return "left" if img_view is self.left_view else "right"
+
+    def view_inputs(self, img_view: ImageView):
+        """Snapshot of everything drawn on a view (used to skip redundant redraws)"""
+        if img_view is self.left_view:
+            version = self.img_version
+            points = tuple((p.x, p.y) for p in img_view.points or ())
+        else:
+            version = self.warped_preview_version
+            points = self.rulers.version
+        return version, img_view.canvas.winfo_width(), img_view.canvas.winfo_height(), points, self.settings
+
+    def draw_left_view(self):
+        if self.preview_img is None:
+            return
+        self.left_view.img = self.preview_img
+        self.left_view.img_version = self.img_version
+        self.resize_view(self.left_view)
         self.draw_image(self.left_view)
         self.draw_bounding_box(self.left_view)
 
-        if self.right_view.img is not None:
-            self.draw_image(self.right_view)
-            self.draw_corrected_bounding_box(self.right_view)
-            if self.right_view.points:
-                ruler_point_map = self.create_ruler_point_mapping(self.right_view)
-                self.draw_rulers(self.right_view, ruler_point_map)
-                self.draw_ruler_labels(ruler_point_map)
-
-    def resize_callback(self, event):
-        self.draw()  # redraw everything to the new canvas display sizes
+    def draw_right_view(self):
+        if self.warped_preview is None:
+            return
+        self.right_view.img = self.warped_preview
+        self.right_view.img_version = self.warped_preview_version
+        self.resize_view(self.right_view)
+        self.draw_image(self.right_view)
+        self.draw_corrected_bounding_box(self.right_view)
+        # (also called without rulers, to remove drawings of deleted rulers)
+        self.draw_rulers(self.right_view)
+        self.draw_ruler_labels()
+
+    def resize_callback(self, img_view: ImageView, event):
+        self.draw(self.redraw_part(img_view))  # redraw to the new canvas display size
 
     def rotate_image_clockwise(self):
-        if self.img is not None:
-            self.img = cv2.rotate(self.img, cv2.ROTATE_90_CLOCKWISE)
-            self.init_bounding_box(self.left_view)  # redraw box since it is hard to rotate points
-            self.warp_image()
-            self.draw()
+        self.rotate_image(1)
 
     def rotate_image_anticlockwise(self):
-        if self.img is not None:
-            self.img = cv2.rotate(self.img, cv2.ROTATE_90_COUNTERCLOCKWISE)
-            self.init_bounding_box(self.left_view)  # redraw box since it is hard to rotate points
-            self.warp_image()
-            self.draw()
+        self.rotate_image(-1)
+
+    def rotate_image(self, quarter_turns: int):
+        """
+        Rotate the shown image clockwise quarter_turns * 90 degrees.
+        Only the preview is rotated; the rotation of the full resolution
+        image is included in the warp when saving.
+        """
+        if self.preview_img is None:
+            return
+        old_box_geometry = self.get_box_geometry() if len(self.rulers) else None
+        old_image_size = self.image_size
+        self.rotation = (self.rotation + quarter_turns) % 4
+        self.preview_img = rotate_image(self.preview_img, quarter_turns)
+        self.image_size = rotated_size(self.image_size, quarter_turns)
+        self.img_version += 1
+        # Rotate the box corners along with the image:
+        corners = rotate_relative_points([[p.x, p.y] for p in self.left_view.points], quarter_turns)
+        for p, (x, y) in zip(self.left_view.points, corners):
+            p.x = float(x)
+            p.y = float(y)
+        # and keep the rulers at the same position in the image:
+        if old_box_geometry is not None:
+            positions = old_box_geometry.relative_to_image(self.rulers.all_vertices())
+            positions = rotate_relative_points(positions / old_image_size, quarter_turns) * self.image_size
+            new_positions = self.get_box_geometry().image_to_relative(positions)
+            self.rulers.set_all_vertices(new_positions)
+        self.draw()
 
     def go_to_measurement_window(self):
         already_in_measurement_window = (
@@ -504,8 +788,11 @@ class FishMesh:
         self.toggle_mini_window_button.pack_forget()
         self.to_box_drawing_window_button.pack(side=tk.LEFT)
         self.save_button.pack(side=tk.LEFT)
+        self.detect_fish_button.pack(side=tk.LEFT)
 
         self.right_view.canvas.pack(fill="both", expand=True)
+        if self.settings.detect_fish_on_measure and not len(self.rulers):
+            self.detect_fish()
 
     def go_to_box_drawing_window(self):
         if self.in_box_drawing_window:
@@ -517,6 +804,7 @@ class FishMesh:
         # top menu
         self.to_box_drawing_window_button.pack_forget()
         self.save_button.pack_forget()
+        self.detect_fish_button.pack_forget()
         self.rotate_clockwise_button.pack(side=tk.LEFT)
         self.rotate_anticlockwise_button.pack(side=tk.LEFT)
         self.to_measurement_window_button.pack(side=tk.LEFT)
@@ -547,81 +835,111 @@ class FishMesh:
             self.toggle_mini_window_button.configure(text="Hide")
 
     def run(self):
+        self.window.after_idle(self.log_startup_report)
         self.window.mainloop()
 
-    def draw_point(self, img_view: ImageView, point: Point, color=None):
-        w = img_view.resized_width
-        h = img_view.resized_height
-        if point.color is not None:
-            _color = point.color
-        if color is not None:
-            _color = color
-        drawing = img_view.canvas.create_oval(
-            img_view.x_padding + int(w * point.x) - self.point_radii,
-            img_view.y_padding + int(h * point.y) - self.point_radii,
-            img_view.x_padding + int(w * point.x) + self.point_radii,
-            img_view.y_padding + int(h * point.y) + self.point_radii,
-            # fill=_color,
+    def log_startup_report(self):
+        """Log how long it took to show the window (called once the window is shown)"""
+        logger.info(startup_report(STARTUP_TIME, import_timer, self.startup_steps))
+        # Modules only needed for saving are imported in the background while the first image is selected:
+        threading.Thread(target=preload_export_modules, daemon=True).start()
+
+    def close(self):
+        if self.export_worker.pending:
+            # Exports that are still being written would be lost when exiting:
+            self.saving_label.configure(text=f"Saving {self.export_worker.pending} before closing...")
+            self.window.configure(cursor="watch")
+            self.window.update_idletasks()
+            self.export_worker.flush()
+            try:
+                while True:
+                    result = self.export_worker.results.get_nowait()
+                    if result.error is not None:
+                        logger.error(f"Failed to save {result.job.image_path.name}:")
+                        logger.exception(result.error)
+            except queue.Empty:
+                pass
+        self.prefetcher.shutdown()
+        logger.info("Closing program")
+        self.window.destroy()
+
+    def hit_radius(self) -> float:
+        """Distance (in canvas pixels) from the center of a drawn point within which clicks select it"""
+        return self.point_radii + HIT_HALO
+
+    def draw_point(self, img_view: ImageView, key: Tuple, point: Point):
+        return img_view.overlay.oval(
+            key,
+            img_view.x_padding + int(img_view.resized_width * point.x),
+            img_view.y_padding + int(img_view.resized_height * point.y),
+            self.point_radii,
             fill=self.settings.draw_color
         )
-        return drawing
 
     def init_bounding_box(self, img_view):
+        if self.preview_img is not None:
+            # Place the corners on the reference box, if it can be found:
+            try:
+                corners = self.detect_box_corners(self.preview_img)
+            except Exception as e:
+                # (e.g. an invalid marker dictionary in the settings file; the box can still be drawn by hand)
+                logger.error("Encountered error while trying to detect the reference box:")
+                logger.exception(e)
+                corners = None
+            if corners is not None:
+                img_view.points = [Point(float(x), float(y)) for x, y in corners]
+                return
         top_left = Point(0.20, 0.20)
         bottom_left = Point(0.20, 0.80)
         bottom_right = Point(0.80, 0.80)
         top_right = Point(0.80, 0.20)
         img_view.points = [top_left, bottom_left, bottom_right, top_right]
 
+    def detect_box_corners(self, img) -> Optional[np.ndarray]:
+        """Corners (relative to the image size) of the reference box in img, if found"""
+        corners = None
+        if self.settings.use_fiducial_markers:
+            # The markers give a fit of the whole box (more robust than the outline):
+            corners = detect_marker_box(
+                img,
+                self.settings.marker_dictionary,
+                self.settings.marker_positions,
+                self.settings.marker_size,
+                (self.settings.measure_box_width, self.settings.measure_box_height),
+            )
+        if corners is None and self.settings.detect_reference_box:
+            corners = detect_reference_box(img)
+        return corners
+
     def draw_bounding_box(self, img_view):
         if img_view.points is None or len(img_view.points) == 0:
             self.init_bounding_box(img_view)
 
-        # TODO: simplify drawing lines and points (naming and structuring should also be improved)
         # Draw lines
         col = self.settings.draw_color
         # To get the correct pair of points we need a certain order:
-        if img_view.drawn_lines:
-            for line in img_view.drawn_lines:
-                img_view.canvas.delete(line)
-        img_view.drawn_lines = []
         x0 = img_view.x_padding
         y0 = img_view.y_padding
         point_arr = np.stack([np.array([(p.x * img_view.resized_width) + x0, (p.y * img_view.resized_height) + y0]) for p in img_view.points])
         # order to get top_left, top_right, bottom_right, bottom_left:
-        ordered_point_arr = _reorder_corner_points(point_arr, "clockwise")
+        ordered_point_arr = reorder_corner_points(point_arr, "clockwise")
         ps = np.reshape(ordered_point_arr, (4,2))
-        img_view.drawn_lines.append(img_view.canvas.create_line(ps[0,0], ps[0,1], ps[1,0], ps[1,1], fill=col))
-        img_view.drawn_lines.append(img_view.canvas.create_line(ps[1,0], ps[1,1], ps[2,0], ps[2,1], fill=col))
-        img_view.drawn_lines.append(img_view.canvas.create_line(ps[2,0], ps[2,1], ps[3,0], ps[3,1], fill=col))
-        img_view.drawn_lines.append(img_view.canvas.create_line(ps[3,0], ps[3,1], ps[0,0], ps[0,1], fill=col))
+        for i in range(4):
+            j = (i + 1) % 4
+            img_view.overlay.line(("box_line", i), (ps[i, 0], ps[i, 1], ps[j, 0], ps[j, 1]), fill=col)
 
-        w = img_view.resized_width
-        h = img_view.resized_height
-        # Delete the previously drawn points:
-        if img_view.drawn_points:
-            for drawn_corner in img_view.drawn_points:
-                img_view.canvas.delete(drawn_corner)
-        # Draw bounding box (and keep track of points):
-        img_view.drawn_points = []
-        for point in img_view.points:
+        # Draw bounding box corners (and keep track of points):
+        corner_keys = []
+        for i, point in enumerate(img_view.points):
             if point is not None:
-                canvas_point = img_view.canvas.create_oval(
-                    # set point diagonal as 2% of monitor screen width
-                    img_view.x_padding + int(w * point.x) - self.point_radii,
-                    img_view.y_padding + int(h * point.y) - self.point_radii,
-                    img_view.x_padding + int(w * point.x) + self.point_radii,
-                    img_view.y_padding + int(h * point.y) + self.point_radii,
-                    fill=col
-                )
-                img_view.drawn_points.append(canvas_point)
+                self.draw_point(img_view, ("corner", i), point)
+                corner_keys.append(("corner", i))
+        img_view.drawn_points = PointIndex(
+            corner_keys, [img_view.overlay.center(key) for key in corner_keys], self.hit_radius()
+        )
 
     def draw_corrected_bounding_box(self, img_view):
         # Draw lines
-        if self.measure_box_lines:
-            for line in self.measure_box_lines:
-                img_view.canvas.delete(line)
-
         col = self.settings.draw_color
         x0 = img_view.x_padding
         y0 = img_view.y_padding
@@ -630,290 +948,108 @@ class FishMesh:
         max_x = (1 - self.margin_ratio) * img_view.resized_width + x0
         max_y = (1 - self.margin_ratio) * img_view.resized_height + y0
         # draw lines: top_left, top_right, bottom_right, bottom_left:
-        self.measure_box_lines = []
-        self.measure_box_lines.append(img_view.canvas.create_line(min_x, min_y, min_x, max_y, fill=col))
-        self.measure_box_lines.append(img_view.canvas.create_line(min_x, max_y, max_x, max_y, fill=col))
-        self.measure_box_lines.append(img_view.canvas.create_line(max_x, max_y, max_x, min_y, fill=col))
-        self.measure_box_lines.append(img_view.canvas.create_line(max_x, min_y, min_x, min_y, fill=col))
+        img_view.overlay.line(("measure_box_line", 0), (min_x, min_y, min_x, max_y), fill=col)
+        img_view.overlay.line(("measure_box_line", 1), (min_x, max_y, max_x, max_y), fill=col)
+        img_view.overlay.line(("measure_box_line", 2), (max_x, max_y, max_x, min_y), fill=col)
+        img_view.overlay.line(("measure_box_line", 3), (max_x, min_y, min_x, min_y), fill=col)
 
     # # # # # # # #
     # Draw Rulers #
     # # # # # # # #
-    def create_ruler_point_mapping(self, img_view) -> Dict[int, List[Point]]:
-        """
-        Generate a mapping from ruler_id to points,
-        using the point's ruler_id field.
-        """
-        if img_view.points is None:
-            return {}
-        rulers: Dict[int, List[Point]] = {}
-        for p in img_view.points:
-            if p.ruler_id not in rulers:
-                rulers[p.ruler_id] = [p]
-            else:
-                rulers[p.ruler_id].append(p)
-        return rulers
-
-    def draw_rulers(self, img_view, ruler_point_map: Dict[int, List[Point]]):
-        if img_view.points is None or len(img_view.points) == 0:
-            # self.init_ruler(img_view)
-            return
-
+    def draw_rulers(self, img_view):
         w = img_view.resized_width
         h = img_view.resized_height
-
-        # Before drawing, clear previous drawings:
-        clear_drawings(img_view)
+        offset = (img_view.x_padding, img_view.y_padding)
+        ruler_ids = self.rulers.ids.tolist()
+        # Canvas coordinates of all endpoints, [ruler, endpoint, x/y]:
+        canvas_endpoints = (self.rulers.endpoints * (w, h) + offset).tolist()
 
         # Draw the ruler's line
-        img_view.drawn_lines = []
-        img_view.drawn_points = []
-        for ruler_points in ruler_point_map.values():
-            p1 = ruler_points[0]
-            p2 = ruler_points[1]
+        point_keys = []
+        point_positions = []
+        for ruler_id, endpoints in zip(ruler_ids, canvas_endpoints):
+            if self.rulers.is_curved(ruler_id):
+                vertices = (self.rulers.vertices(ruler_id) * (w, h) + offset).tolist()
+            else:
+                vertices = endpoints
             # Draw line:
-            img_view.drawn_lines.append(img_view.canvas.create_line(
-                img_view.x_padding + (w * p1.x),
-                img_view.y_padding + (h * p1.y),
-                img_view.x_padding + (w * p2.x),
-                img_view.y_padding + (h * p2.y),
+            img_view.overlay.line(
+                ("ruler_line", ruler_id),
+                [coordinate for vertex in vertices for coordinate in vertex],
                 width=1,
-                # fill=p1.color
-                fill=self.settings.draw_color
-            ))
-            # Draw points:
-            drawn_point = img_view.canvas.create_oval(
-                img_view.x_padding + int(w * p1.x) - self.point_radii,
-                img_view.y_padding + int(h * p1.y) - self.point_radii,
-                img_view.x_padding + int(w * p1.x) + self.point_radii,
-                img_view.y_padding + int(h * p1.y) + self.point_radii,
-                # fill=p1.color
                 fill=self.settings.draw_color
             )
-            p1.drawing_id = drawn_point
-            img_view.drawn_points.append(drawn_point)
-
-            drawn_point = img_view.canvas.create_oval(
-                img_view.x_padding + int(w * p2.x) - self.point_radii,
-                img_view.y_padding + int(h * p2.y) - self.point_radii,
-                img_view.x_padding + int(w * p2.x) + self.point_radii,
-                img_view.y_padding + int(h * p2.y) + self.point_radii,
-                # fill=p2.color
-                fill=self.settings.draw_color
-            )
-            p2.drawing_id = drawn_point
-            img_view.drawn_points.append(drawn_point)
+            # Draw points:
+            for i, (x, y) in enumerate(vertices):
+                key = ("ruler_point", ruler_id, i)
+                img_view.overlay.oval(key, int(x), int(y), self.point_radii, fill=self.settings.draw_color)
+                point_keys.append(key)
+                point_positions.append((int(x), int(y)))
+        img_view.drawn_points = PointIndex(point_keys, point_positions, self.hit_radius())
+
+        # Remove drawings of deleted rulers:
+        img_view.overlay.delete_group(
+            "ruler_line", keep=[("ruler_line", ruler_id) for ruler_id in ruler_ids]
+        )
+        img_view.overlay.delete_group("ruler_point", keep=point_keys)
 
-    def find_ruler_label_position(self, ruler_point_map: Dict[int, List[Point]], coordinates_type: str = "canvas"):
+    def find_ruler_label_position(self) -> np.ndarray:
         """
-        Find where to place ruler labels.
-        For simplicity, the label is placed on the side of the ruler closest to the
-        image center (this assumes the fish to be laid down along the edge of the box).
-        If the line is closest to horizontal, draw label left/right of inner point.
-        if the line is closest to vertical, draw label over/under of inner point.
-
-        :coordinates_type: "canvas" | "full_image"
+        Find where to place the labels of all rulers on the canvas (see ruler_label_anchors()),
+        as an (n, 2) array in the row order of self.rulers.
         """
-        ruler_label_position = {}
-        for i, (ruler_id, ruler_points) in enumerate(ruler_point_map.items()):
-            p1 = ruler_points[0]
-            p2 = ruler_points[1]
-            dx = p2.x - p1.x
-            dy = p2.y - p1.y
-            vertically_aligned = abs(dy) > abs(dx)  # def: line with slope higher than 45 deg
-            label_placement = "unknown"
-            if vertically_aligned:
-                # The point used for labeling will the the one closest to the image center:
-                p1_above_p2 = dy >= 0
-                p1_below_p2 = dy < 0
-                if abs(p1.y - 0.5) <= abs(p2.y - 0.5):
-                    label_point = deepcopy(p1)
-                    if p1_above_p2:
-                        label_placement = "over"
-                    elif p1_below_p2:
-                        label_placement = "under"
-                else:
-                    label_point = deepcopy(p2)
-                    if p1_above_p2:
-                        label_placement = "under"
-                    elif p1_below_p2:
-                        label_placement = "over"
-            else:  # horizontally aligned
-                p1_left_of_p2 = dx >= 0
-                p1_right_of_p2 = dx < 0
-                if abs(p1.x - 0.5) <= abs(p2.x - 0.5):
-                    label_point = deepcopy(p1)
-                    if p1_left_of_p2:
-                        label_placement = "left"
-                    elif p1_right_of_p2:
-                        label_placement = "right"
-                else:
-                    label_point = deepcopy(p2)
-                    if p1_left_of_p2:
-                        label_placement = "right"
-                    elif p1_right_of_p2:
-                        label_placement = "left"
-
-            if coordinates_type == "canvas":
-                x = label_point.x * self.right_view.resized_width + self.right_view.x_padding
-                y = label_point.y * self.right_view.resized_height + self.right_view.y_padding
-            elif coordinates_type == "full_image":
-                # For drawing rulers and labels when saving the image.
-                img_width = self.warped_image.shape[1]
-                img_height = self.warped_image.shape[0]
-                x = label_point.x * img_width
-                y = label_point.y * img_height
-            else:
-                raise ValueError(f"Received unknown coordinate_type: '{coordinates_type}'")
-            if label_placement == "over":
-                # TODO: maybe used max(font_size, point_radii) * 3 as distance measure to place text relative to point
-                y -= self.point_radii * 3
-            elif label_placement == "under":
-                y += self.point_radii * 3
-            elif label_placement == "left":
-                x -= self.point_radii * 3
-            elif label_placement == "right":
-                x += self.point_radii * 3
-            else:
-                raise RuntimeError(
-                    f"Unable to find 'label_placement' for ruler {ruler_id} (color: {p1.color})"
-                )
-            ruler_label_position[ruler_id] = (x, y)
-        return ruler_label_position
-
-    def read_rulers(self, ruler_point_map: Dict[int, List[Point]]):
-        img_to_box_scale_ratio = 1 / (1 - 2 * self.margin_ratio)
-        ruler_values = {}
-        for ruler_id, ruler_points in ruler_point_map.items():
-            p1 = ruler_points[0]
-            p2 = ruler_points[1]
-            ruler_values[ruler_id] = np.sqrt(
-                (img_to_box_scale_ratio * self.settings.measure_box_width * (p1.x - p2.x)) ** 2
-                + (img_to_box_scale_ratio * self.settings.measure_box_height * (p1.y - p2.y)) ** 2
-            )
-        return ruler_values
-
-    def draw_ruler_labels(self, ruler_point_map: Dict[int, List[Point]]):
+        anchors, directions = ruler_label_anchors(self.rulers.endpoints)
+        scale = (self.right_view.resized_width, self.right_view.resized_height)
+        offset = (self.right_view.x_padding, self.right_view.y_padding)
+        # TODO: maybe used max(font_size, point_radii) * 3 as distance measure to place text relative to point
+        return anchors * scale + offset + directions * (self.point_radii * 3)
+
+    def read_rulers(self) -> np.ndarray:
+        """Lengths (cm) of all rulers, in the row order of self.rulers"""
+        return self.rulers.lengths(relative_to_cm_scale(
+            self.margin_ratio,
+            self.settings.measure_box_width,
+            self.settings.measure_box_height,
+        ))
+
+    def draw_ruler_labels(self):
         """
         draw ruler labels with the measurement
         """
-
-        # Clear existing ruler labels before drawing new ones:
-        self.clear_ruler_label_drawings()
-
-        label_positions = self.find_ruler_label_position(ruler_point_map)
-        ruler_values = self.read_rulers(ruler_point_map)
-        for i, ruler_id in enumerate(ruler_point_map.keys()):
-            x, y = label_positions[ruler_id]
-            value = ruler_values[ruler_id]
-            # color = ruler_point_map[ruler_id][0].color
-            color = self.settings.draw_color
-            # self.right_view.canvas.create_text(10, 10, text=text, fill="red", anchor=tk.NW, font=(None, 16))
-            drawn_label = self.right_view.canvas.create_text(
-                x, y, text=f"{i + 1}: {value:.1f} cm", fill=color, anchor=tk.NW, font=(None, self.settings.font_size)
+        overlay = self.right_view.overlay
+        label_positions = self.find_ruler_label_position().tolist()
+        ruler_values = self.read_rulers().tolist()
+        ruler_ids = self.rulers.ids.tolist()
+        for i, row in enumerate(self.rulers.creation_order().tolist()):
+            ruler_id = ruler_ids[row]
+            x, y = label_positions[row]
+            value = ruler_values[row]
+            overlay.text(
+                ("ruler_label", ruler_id),
+                x, y,
+                text=f"{i + 1}: {value:.1f} cm",
+                fill=self.settings.draw_color,
+                anchor=tk.NW,
+                font=(None, self.settings.font_size),
             )
-            self.drawn_ruler_labels.append(drawn_label)
-
-    def clear_ruler_label_drawings(self):
-        if self.drawn_ruler_labels:
-            for label in self.drawn_ruler_labels:
-                self.right_view.canvas.delete(label)
-
-    def create_save_image(self):
-        """
-        when saving the image, draw rulers and ruler labels
-        on the original image to keep original resolution.
-        """
-        ruler_point_map = self.create_ruler_point_mapping(self.right_view)
-        label_positions = self.find_ruler_label_position(ruler_point_map, coordinates_type="full_image")
-        ruler_values = self.read_rulers(ruler_point_map)
-        save_image = deepcopy(self.warped_image)
-        img_width = self.warped_image.shape[1]
-        img_height = self.warped_image.shape[0]
-
-        scaled_font_size = self.get_original_image_font_size(
-            self.settings.font_size
-        )
-        color = self.settings.draw_color
-        rgb = self.hex_color_to_rgb(color)
-        for i, (ruler_id, points) in enumerate(ruler_point_map.items()):
-            # draw lines
-            # color = self.tk_color_to_rgb(points[0].color)
-            p0 = (
-                int(points[0].x * img_width),
-                int(points[0].y * img_height)
-            )
-            p1 = (
-                 int(points[1].x * img_width),
-                 int(points[1].y * img_height)
-            )
-            # rgb = self.hex_color_to_rgb(color)
-            cv2.line(save_image, p0, p1, color=rgb, thickness=1, lineType=cv2.LINE_4)
-
-            lbl_x, lbl_y = label_positions[ruler_id]
-            value = ruler_values[ruler_id]
-
-            output_ruler_id = i + 1
-            cv2.putText(
-                img=save_image,
-                text=f"{output_ruler_id}: {value:.1f} cm",
-                org=(int(lbl_x), int(lbl_y)),
-                fontFace=cv2.FONT_HERSHEY_DUPLEX,  # cv2.FONT_HERSHEY_SIMPLEX,
-                fontScale=int(np.ceil(scaled_font_size)),
-                thickness=int(np.ceil(scaled_font_size)),
-                color=rgb,
-            )
-
-        # Draw bounding box
-        min_x = int(self.margin_ratio * img_width)
-        min_y = int(self.margin_ratio * img_height)
-        max_x = int((1 - self.margin_ratio) * img_width)
-        max_y = int((1 - self.margin_ratio) * img_height)
-        # draw lines: top_left, top_right, bottom_right, bottom_left:
-        cv2.line(save_image, (min_x, min_y), (min_x, max_y), color=rgb, thickness=1, lineType=cv2.LINE_4)
-        cv2.line(save_image, (min_x, max_y), (max_x, max_y), color=rgb, thickness=1, lineType=cv2.LINE_4)
-        cv2.line(save_image, (max_x, max_y), (max_x, min_y), color=rgb, thickness=1, lineType=cv2.LINE_4)
-        cv2.line(save_image, (max_x, min_y), (min_x, min_y), color=rgb, thickness=1, lineType=cv2.LINE_4)
-
-        save_image = cv2.cvtColor(save_image, cv2.COLOR_RGB2BGR)
-        return save_image
-
-    def get_original_image_font_size(self, font_size: int):
-        """
-            Get the size of the font to be drawn on the original image
-            from the font size drawn on the screen (on resized image)
-        """
-        # get font size relative to resized image
-        resized_height = self.right_view.resized_height
-        img_relative_font_size = font_size / resized_height  # both are in pixels
-
-        # Get the number of pixels this represents on the original image
-        # scaled_font_size = img_relative_font_size * len(self.img)
-        scaled_font_size = img_relative_font_size * len(self.warped_image)
-
-        # Correct any differences in font size between tkinter and cv2
-        corrected_font_size = (
-                scaled_font_size
-                * self.get_font_scale_correction_by_font_size_diff(font_size)
+        # Remove labels of deleted rulers:
+        overlay.delete_group("ruler_label", keep=[("ruler_label", ruler_id) for ruler_id in ruler_ids])
+
+    def export_record(self, image_file: str) -> ExportRecord:
+        """What is needed to render the exports of the current image (also saved as a sidecar)"""
+        ruler_ids = self.rulers.ids[self.rulers.creation_order()].tolist()
+        rulers = [self.rulers.vertices(ruler_id).tolist() for ruler_id in ruler_ids]
+        return ExportRecord(
+            source_image=str(self.selected_input_file),
+            image_file=image_file,
+            rotation=self.rotation,
+            corners=[[p.x, p.y] for p in self.left_view.points],
+            margin_ratio=self.margin_ratio,
+            box_width=self.settings.measure_box_width,
+            box_height=self.settings.measure_box_height,
+            rulers=rulers,
+            view_height=self.right_view.resized_height,
         )
-        return corrected_font_size
-
-    @staticmethod
-    def get_font_scale_correction_by_font_size_diff(font_size: int, cv2_font=cv2.FONT_HERSHEY_DUPLEX):
-        """
-        Get correction for the size of a font relative to the
-        size of the cv2 font with fontScale=1, thickness=1
-        """
-        cv2_text_height = cv2.getTextSize(text="A", fontFace=cv2_font, fontScale=font_size, thickness=font_size)[0][1]
-        return font_size / cv2_text_height
-
-    @staticmethod
-    def hex_color_to_rgb(hex: str) -> Tuple[int, int, int]:
-        _hex = hex.lstrip("#")
-        r = int(_hex[0:2], 16)
-        g = int(_hex[2:4], 16)
-        b = int(_hex[4:6], 16)
-        return r, g, b
 
     def left_click_callback(self, img_view: ImageView, create_rulers_on_click: bool, bound_to: str, event):
         if img_view.canvas_img is not None:
@@ -921,58 +1057,54 @@ class FishMesh:
             y = event.y
             x, y = self.restrict_position(x, y, img_view, bound_to)
 
-            # Hack: tkinter doesn't allow to separate drawn canvas types.
-            #       solution: delete drawn text when clicking points:
-            for label in self.drawn_ruler_labels:
-                img_view.canvas.delete(label)
-
-            drawn_points = img_view.drawn_points if img_view.drawn_points is not None else []
-            closest = img_view.canvas.find_closest(x, y, halo=10, start=drawn_points)
-            selected_point_id = closest[0]
-            if selected_point_id in drawn_points:
-                # create reference to point in img_view.points to easily adjust its position:
-                # Find the clicked point
-                selected_point_idx = img_view.drawn_points.index(selected_point_id)
-                self.dragged_point = img_view.points[selected_point_idx]
+            selected_point = None
+            if img_view.drawn_points is not None:
+                selected_point = img_view.drawn_points.nearest(x, y, self.hit_radius())
+            if selected_point is not None:
+                self.dragged_point = selected_point
                 # Update dragged_point with click position (might be slightly off original position):
-                self.dragged_point.x = (x - img_view.x_padding) / img_view.resized_width
-                self.dragged_point.y = (y - img_view.y_padding) / img_view.resized_height
-                # First part of animation: removing it from original position to a position centered on mouse:
-                img_view.drawn_points.remove(selected_point_id)
-                self.draw()
+                self.move_point(
+                    self.dragged_point,
+                    (x - img_view.x_padding) / img_view.resized_width,
+                    (y - img_view.y_padding) / img_view.resized_height,
+                )
+                # First part of animation: moving it from original position to a position centered on mouse:
+                self.redraw_scheduler.latency.reset()
+                self.draw(self.redraw_part(img_view))
             elif create_rulers_on_click:
                 if self.new_ruler_start_point is None:
                     # Add the released point:
                     rel_x = (x - img_view.x_padding) / img_view.resized_width
                     rel_y = (y - img_view.y_padding) / img_view.resized_height
-                    self.new_ruler_start_point = Point(
-                        # rel_x, rel_y, self.num_rulers_created + 1, self.settings.colors[(self.num_rulers_created + 1) % len(self.settings.colors)]
-                        rel_x, rel_y, self.num_rulers_created + 1, self.settings.draw_color
+                    self.new_ruler_start_point = Point(rel_x, rel_y, self.settings.draw_color)
+                    self.new_ruler_start_point.drawing_id = self.draw_point(
+                        img_view, ("new_ruler", "start"), self.new_ruler_start_point
+                    )
+                elif event.state & SHIFT_MASK:
+                    # Shift+click adds a vertex, for measuring along a bent fish with a curved ruler:
+                    rel_x = (x - img_view.x_padding) / img_view.resized_width
+                    rel_y = (y - img_view.y_padding) / img_view.resized_height
+                    vertex = Point(rel_x, rel_y, self.settings.draw_color)
+                    vertex.drawing_id = self.draw_point(
+                        img_view, ("new_ruler", "vertex", len(self.new_ruler_vertices)), vertex
                     )
-                    self.new_ruler_start_point.drawing_id = self.draw_point(img_view, self.new_ruler_start_point)
+                    self.new_ruler_vertices.append(vertex)
                 else:
                     rel_x = (x - img_view.x_padding) / img_view.resized_width
                     rel_y = (y - img_view.y_padding) / img_view.resized_height
-                    self.num_rulers_created += 1
-                    if img_view.points is None:
-                        img_view.points = []
-                    img_view.points.extend([
-                        deepcopy(self.new_ruler_start_point),
-                        Point(
-                            # rel_x, rel_y, self.num_rulers_created, self.settings.colors[self.num_rulers_created % len(self.settings.colors)]
-                            rel_x, rel_y, self.num_rulers_created, self.settings.draw_color
-                        )
-                    ])
-                    img_view.canvas.delete(self.new_ruler_start_point.drawing_id)
-                    img_view.canvas.delete(self.drawn_ruler_end)
-                    img_view.canvas.delete(self.drawn_ruler_line)
-                    self.drawn_ruler_end = None
-                    self.drawn_ruler_line = None
+                    start = self.new_ruler_start_point
+                    ruler_id = self.rulers.add(
+                        (start.x, start.y), (rel_x, rel_y), [(p.x, p.y) for p in self.new_ruler_vertices]
+                    )
+                    if self.settings.snap_ruler_endpoints:
+                        self.snap_ruler_endpoints(ruler_id, (0, 1))
+                    img_view.overlay.delete_group("new_ruler")
                     self.new_ruler_start_point = None
+                    self.new_ruler_vertices = []
                     self.draw()
 
     def drag_callback(self, img_view: ImageView, bound_to: str, event):
-        if self.img is None:
+        if self.preview_img is None:
             return
 
         x = event.x
@@ -982,11 +1114,16 @@ class FishMesh:
 
         if self.dragged_point is not None:
             img_view.canvas.configure(cursor="none")
-            img_view.canvas.delete(self.dragged_point.drawing_id)
             # Update dragged_point with click position to moving mouse:
-            self.dragged_point.x = (x - img_view.x_padding) / img_view.resized_width
-            self.dragged_point.y = (y - img_view.y_padding) / img_view.resized_height
-            self.draw()
+            self.move_point(
+                self.dragged_point,
+                (x - img_view.x_padding) / img_view.resized_width,
+                (y - img_view.y_padding) / img_view.resized_height,
+            )
+            if img_view is self.left_view:
+                self.draw("warp", "left", "right")  # live preview of the warp
+            else:
+                self.draw("right")
 
     def release_callback(self, img_view: ImageView, bound_to: str, event):
         """
@@ -1002,14 +1139,89 @@ class FishMesh:
             # make sure point isn't dragged outside canvas
             x, y = self.restrict_position(x, y, img_view, bound_to)
 
-            img_view.canvas.delete(self.dragged_point.drawing_id)
             # Update point with the release position:
-            self.dragged_point.x = (x - img_view.x_padding) / img_view.resized_width
-            self.dragged_point.y = (y - img_view.y_padding) / img_view.resized_height
+            self.move_point(
+                self.dragged_point,
+                (x - img_view.x_padding) / img_view.resized_width,
+                (y - img_view.y_padding) / img_view.resized_height,
+            )
+            if self.dragged_point[0] == "corner" and self.settings.snap_box_corners:
+                self.snap_corner(self.dragged_point[1])
+            elif self.dragged_point[0] == "ruler_point" and self.settings.snap_ruler_endpoints:
+                _, ruler_id, vertex = self.dragged_point
+                last_vertex = len(self.rulers.vertices(ruler_id)) - 1
+                if vertex in (0, last_vertex):
+                    self.snap_ruler_endpoints(ruler_id, (0 if vertex == 0 else 1,))
             self.dragged_point = None
-            self.warp_image()
+            logger.info(f"Dragged point: {self.redraw_scheduler.latency.summary()}")
             self.draw()
 
+    def snap_corner(self, corner_index: int):
+        """
+        Move a box corner onto the nearest clear corner in the image (see refine_corner()).
+        Only a small window of the full resolution image around the corner is searched
+        (the preview is used while the full resolution image is loading).
+        """
+        point = self.left_view.points[corner_index]
+        if self.img is not None:
+            img, quarter_turns = self.img, self.rotation
+        else:
+            img, quarter_turns = self.preview_img, 0  # (already rotated)
+        img_size = (img.shape[1], img.shape[0])
+        shown_width, shown_height = rotated_size(img_size, quarter_turns)
+        # The full resolution image isn't rotated, so map the position to it and back:
+        to_shown = rotation_matrix(quarter_turns, img_size)
+        x, y, _ = np.linalg.solve(to_shown, (point.x * shown_width, point.y * shown_height, 1))
+        radius = int(np.ceil(SNAP_RADIUS * shown_width / self.left_view.resized_width))
+        corner = refine_corner(img, x, y, radius)
+        if corner is None:
+            return
+        x, y, _ = to_shown @ (corner[0], corner[1], 1)
+        point.x = float(x / shown_width)
+        point.y = float(y / shown_height)
+
+    def snap_ruler_endpoints(self, ruler_id: int, endpoints: Tuple[int, ...]):
+        """
+        Move ruler endpoints onto the strongest edge (e.g. the snout or the tail fork
+        of the fish) along the ruler direction (of the first/last segment of a curved ruler),
+        searched for in the warped preview
+        endpoints: 0 (first) and/or 1 (last)
+        """
+        if self.warped_preview is None:
+            return
+        edge_map = self.get_edge_map()
+        size = np.array([edge_map.width, edge_map.height], np.float64)
+        vertices = self.rulers.vertices(ruler_id) * size
+        end_segments = {0: (vertices[0], vertices[1]), 1: (vertices[-1], vertices[-2])}
+        radius = SNAP_RADIUS * edge_map.width / self.right_view.resized_width
+        for endpoint in endpoints:
+            position, neighbour = end_segments[endpoint]
+            snapped = edge_map.snap_along(*position, position - neighbour, radius)
+            if snapped is not None:
+                # (kept inside the box, like dragged points)
+                x, y = np.clip(np.array(snapped) / size, self.margin_ratio, 1 - self.margin_ratio)
+                self.rulers.move_endpoint(ruler_id, endpoint, float(x), float(y))
+
+    def get_edge_map(self) -> EdgeMap:
+        """Gradient of the warped preview (computed once per warp)"""
+        if self.edge_map is None or self.edge_map_version != self.warped_preview_version:
+            self.edge_map = EdgeMap(self.warped_preview)
+            self.edge_map_version = self.warped_preview_version
+        return self.edge_map
+
+    def move_point(self, point_key: Tuple, x: float, y: float):
+        """
+        Move a drawn point to the relative position x, y
+        point_key: overlay key of the point, ("corner", i) or ("ruler_point", ruler_id, vertex)
+        """
+        if point_key[0] == "corner":
+            point = self.left_view.points[point_key[1]]
+            point.x = x
+            point.y = y
+        else:
+            _, ruler_id, vertex = point_key
+            self.rulers.move_vertex(ruler_id, vertex, x, y)
+
     def move_callback(self, img_view: ImageView, bound_to: str, event):
         if self.new_ruler_start_point is not None:
             x = event.x
@@ -1017,77 +1229,37 @@ class FishMesh:
             # make sure point isn't dragged outside canvas or the drawn box
             x, y = self.restrict_position(x, y, img_view, bound_to)
 
-            img_view.canvas.delete(self.new_ruler_start_point.drawing_id)
             start_x = self.new_ruler_start_point.x * img_view.resized_width + img_view.x_padding
             start_y = self.new_ruler_start_point.y * img_view.resized_height + img_view.y_padding
-            self.new_ruler_start_point.drawing_id = img_view.canvas.create_oval(
-                start_x - self.point_radii,
-                start_y - self.point_radii,
-                start_x + self.point_radii,
-                start_y + self.point_radii,
-                # fill=self.new_ruler_start_point.color
-                fill=self.settings.draw_color
-            )
-            if self.drawn_ruler_end is not None:
-                img_view.canvas.delete(self.drawn_ruler_end)
-            self.drawn_ruler_end = img_view.canvas.create_oval(
-                x - self.point_radii,
-                y - self.point_radii,
-                x + self.point_radii,
-                y + self.point_radii,
-                # fill=self.new_ruler_start_point.color
-                fill=self.settings.draw_color
-            )
-            if self.drawn_ruler_line is not None:
-                img_view.canvas.delete(self.drawn_ruler_line)
-            self.drawn_ruler_line = img_view.canvas.create_line(
-                start_x,
-                start_y,
-                x,
-                y,
-                # fill=self.new_ruler_start_point.color
-                fill=self.settings.draw_color
+            col = self.settings.draw_color
+            self.new_ruler_start_point.drawing_id = img_view.overlay.oval(
+                ("new_ruler", "start"), start_x, start_y, self.point_radii, fill=col
             )
+            img_view.overlay.oval(("new_ruler", "end"), x, y, self.point_radii, fill=col)
+            # (through the vertices of a curved ruler)
+            coordinates = [start_x, start_y]
+            for vertex in self.new_ruler_vertices:
+                coordinates += [
+                    vertex.x * img_view.resized_width + img_view.x_padding,
+                    vertex.y * img_view.resized_height + img_view.y_padding,
+                ]
+            img_view.overlay.line(("new_ruler", "line"), coordinates + [x, y], fill=col)
 
     def right_click_callback(self, img_view: ImageView, event):
         x = event.x
         y = event.y
         if self.new_ruler_start_point is not None:
             # if drawing a new ruler, cancel drawing the ruler
-            img_view.canvas.delete(self.new_ruler_start_point.drawing_id)
-            if self.drawn_ruler_end is not None:
-                img_view.canvas.delete(self.drawn_ruler_end)
-                self.drawn_ruler_end = None
-            if self.drawn_ruler_line is not None:
-                img_view.canvas.delete(self.drawn_ruler_line)
-                self.drawn_ruler_line = None
+            img_view.overlay.delete_group("new_ruler")
             self.new_ruler_start_point = None
-        elif img_view.drawn_points is not None:
-            # Hack: tkinter doesn't allow to separate drawn canvas types.
-            #       solution: delete drawn text when clicking points:
-            for label in self.drawn_ruler_labels:
-                img_view.canvas.delete(label)
-
-            closest = img_view.canvas.find_closest(x, y, halo=10, start=img_view.drawn_points)
-            selected_point_id = closest[0]
-            if selected_point_id in img_view.drawn_points:
-                # Delete selected point (it will be redrawn on the release position)
-                selected_point_idx = img_view.drawn_points.index(selected_point_id)
-                selected_ruler_id = img_view.points[selected_point_idx].ruler_id
-                img_view.drawn_points.remove(selected_point_id)
-                img_view.canvas.delete(selected_point_id)
-                del img_view.points[selected_point_idx]
-                connected_point_idx = 0
-                for p in img_view.points:
-                    if p.ruler_id == selected_ruler_id:
-                        break
-                    connected_point_idx += 1
-                connected_point_drawing_id = img_view.points[connected_point_idx].drawing_id
-                img_view.drawn_points.remove(connected_point_drawing_id)
-                img_view.canvas.delete(connected_point_drawing_id)
-                del img_view.points[connected_point_idx]
-                # self.rulers.remove[selected_ruler_id]
-                self.draw()
+            self.new_ruler_vertices = []
+        elif img_view.drawn_points:
+            selected_point = img_view.drawn_points.nearest(x, y, self.hit_radius())
+            if selected_point is not None:
+                # Delete the selected ruler (its drawings are removed on redraw):
+                _, ruler_id, _ = selected_point
+                self.rulers.delete(ruler_id)
+            self.draw()
 
     def restrict_position(self, x, y, img_view: ImageView, bound_to: str = "image"):
         if bound_to == "image":
@@ -1108,14 +1280,38 @@ class FishMesh:
             raise ValueError("param bound_to must be set to 'image' or 'box'.")
         return x, y
 
+    def warp_inputs(self):
+        return (
+            self.img_version,
+            self.image_size,
+            tuple((p.x, p.y) for p in self.left_view.points or ()),
+            self.margin_ratio,
+        )
+
     def warp_image(self):
-        corners_ndarray = self.points_to_ndarray(self.left_view.points)
-        self.warped_image = warp_image(self.img, corners_ndarray, self.margin_ratio)
-        # self.warp_activated = True
+        """Warp the preview image (fast, done live while dragging the box corners)"""
+        if self.preview_img is None or not self.left_view.points:
+            return
+        preview_size = (self.preview_img.shape[1], self.preview_img.shape[0])
+        self.warped_preview = self.get_box_geometry().scaled(preview_size).warp(
+            self.preview_img, interpolation=PREVIEW_INTERPOLATION
+        )
+        self.warped_preview_version += 1
+
+    def get_box_geometry(self) -> BoxGeometry:
+        """The perspective correction given by the current box corners (on the full resolution image)"""
+        warp_inputs = self.warp_inputs()
+        if self.box_geometry is None or self.box_geometry_inputs != warp_inputs:
+            self.box_geometry = BoxGeometry.from_corners(
+                self.points_to_ndarray(self.left_view.points, self.image_size),
+                self.image_size,
+                self.margin_ratio,
+            )
+            self.box_geometry_inputs = warp_inputs
+        return self.box_geometry
 
-    def points_to_ndarray(self, points: List[Point]):
-        img_width = self.img.shape[1]
-        img_height = self.img.shape[0]
+    def points_to_ndarray(self, points: List[Point], image_size: Tuple[int, int]):
+        img_width, img_height = image_size
         return np.stack([np.array([p.x * img_width, p.y * img_height]) for p in points])
 
     @staticmethod
@@ -1125,7 +1321,14 @@ class FishMesh:
         return bool(matched)
 
     def save_callback(self):
-        if self.warped_image is None:
+        self.redraw_scheduler.flush()  # make sure a pending warp is done
+        if self.warped_preview is None:
+            return
+        if self.img is None:
+            messagebox.showinfo(
+                "Image is loading",
+                "The full resolution image is still loading. Please try again in a moment."
+            )
             return
         try:
             selected_save_path = self.choose_save_file()
@@ -1139,13 +1342,15 @@ class FishMesh:
                     return
                 self.output_folder = save_path.parent
                 img_path = save_path.parent / f"P-{save_path.stem}.jpg"
-                data_path = save_path.parent / f"D-{save_path.stem}.xlsx"
+                # The measurements are added to the results of the folder (and optionally saved per photo):
+                data_path = save_path.parent / f"D-{save_path.stem}.xlsx" if self.settings.save_data_per_photo else None
+                sidecar_path = save_path.parent / f"S-{save_path.stem}.json"
                 existing_file_warnings = []
                 if img_path.exists():
                     existing_file_warnings.append(
                         f"image file {img_path.name}"
                     )
-                if data_path.exists():
+                if data_path is not None and data_path.exists():
                     existing_file_warnings.append(
                         f"excel file {data_path.name}"
                     )
@@ -1158,189 +1363,84 @@ class FishMesh:
                     )
                     if not answered_yes:
                         return
-                self.save_image(path=img_path)
-                self.save_data(data_path=data_path, img_path=img_path)
+                # The exports are written in the background from a snapshot of the measurements:
+                self.export_worker.submit(ExportJob(
+                    record=self.export_record(img_path.name),
+                    img=self.img,
+                    settings=self.settings,
+                    image_path=img_path,
+                    sidecar_path=sidecar_path,
+                    results_path=save_path.parent / RESULTS_DATABASE_NAME,
+                    img_info=self.image_metadata.image_info(),
+                    data_path=data_path,
+                    version=self.rulers.version,
+                ))
+                # (the measurements are safe from here on, unless saving fails)
+                self.saved_rulers_version = self.rulers.version
+                if not self.polling_export_worker:
+                    self.window.after(LOAD_POLL_INTERVAL_MS, self.poll_export_worker)
+                self.polling_export_worker = True
+                self.show_saving_status()
         except Exception as e:
             logger.error("Exception encountered while trying to save image and data files.")
             logger.exception(e)
-        else:
-            self.saved_points = deepcopy(self.right_view.points)
-
-    def save_data(self, data_path: Path, img_path: Path):
-        img_info = get_image_exif_info(self.selected_input_file)
-
-        # Read ruler info (the lengths extracted from the drawn rulers):
-        ruler_info = []
-        ruler_point_map = self.create_ruler_point_mapping(self.right_view)
-        ruler_values = self.read_rulers(ruler_point_map)
-        for i, ruler_id in enumerate(ruler_point_map.keys()):
-            ruler_info.append(dict(
-                measurement_id=i+1,
-                length_cm=ruler_values[ruler_id],
-            ))
-
-        # create table with drawn measurements:
-        df = DataFrame(ruler_info)
-
-        # add box dimensions
-        df.insert(0, "box_width_cm", self.settings.measure_box_width)
-        df.insert(1, "box_height_cm", self.settings.measure_box_height)
-
-        # insert image information and image name (so data can be mapped back to file)
-        # (using insert to insert image information at the front)
-        for i, (field, value) in enumerate(img_info.items()):
-            df.insert(i, field, value)
-
-        df.insert(0, "image_file", img_path.name)
-
-        # Save excel file with the same name as image filename:
-        df.to_excel(str(data_path), index=False, float_format="%.1f")
-        if not data_path.exists():
-            raise WriteResultFileError(
-                f"No output excel file produced for {data_path}."
-            )
 
-    def save_image(self, path: Path):
-        save_image = self.create_save_image()
-        cv2.imwrite(filename=str(path), img=save_image)
-        if not path.exists():
-            raise WriteResultFileError(
-                f"No output image produced for {path}."
+    def poll_export_worker(self):
+        try:
+            while True:
+                self.handle_export_result(self.export_worker.results.get_nowait())
+        except queue.Empty:
+            pass
+        self.show_saving_status()
+        self.polling_export_worker = bool(self.export_worker.pending)
+        if self.polling_export_worker:
+            self.window.after(LOAD_POLL_INTERVAL_MS, self.poll_export_worker)
+
+    def handle_export_result(self, result: ExportResult):
+        if result.error is not None:
+            logger.error("Exception encountered while trying to save image and data files.")
+            logger.exception(result.error)
+            if (
+                result.job.record.source_image == str(self.selected_input_file)
+                and self.saved_rulers_version == result.job.version
+            ):
+                self.saved_rulers_version = None  # (warn before the measurements are reset)
+            messagebox.showerror(
+                "Save Error",
+                f"Could not save the measurements of {result.job.image_path.name}:\n{result.error}"
             )
+            return
+        logger.info(f"Saved the measurements of {result.job.image_path.name}")
+        if self.photo_queue is not None and self.photo_queue.find(result.job.record.source_image) is not None:
+            self.photo_queue.set_status(Path(result.job.record.source_image), "done")
+            self.show_queue_status()
+        log_peak_rss("after saving")
+
+    def show_saving_status(self):
+        if self.export_worker.pending:
+            self.saving_label.configure(text=f"Saving ({self.export_worker.pending})...")
+            self.saving_label.pack(side=tk.RIGHT)
+        else:
+            self.saving_label.pack_forget()
 
 
 def clear_drawings(img_view: ImageView):
-    # delete existing lines:
-    if img_view.drawn_lines:
-        for line in img_view.drawn_lines:
-            img_view.canvas.delete(line)
-    # Delete drawn points:
-    if img_view.drawn_points:
-        for drawn_corner in img_view.drawn_points:
-            img_view.canvas.delete(drawn_corner)
-
-
-def warp_image(img, corner_points, rel_margin: float):
-    corner_points = _reorder_corner_points(corner_points, "anti-clockwise")  # getPerspective expects anti-clockwise
-    img_width = img.shape[1]
-    img_height = img.shape[0]
-    old_corner_points = np.float32(corner_points)
-    # new_corner_points = np.float32([[0, 0],
-    #                                 [img_height, 0],
-    #                                 [img_width, img_height],
-    #                                 [0, img_width]])
-    new_corner_points = np.float32([
-        [rel_margin * img_width, rel_margin * img_height],
-        [rel_margin * img_width, (1 - rel_margin) * img_height],
-        [(1 - rel_margin) * img_width, (1 - rel_margin) * img_height],
-        [(1 - rel_margin) * img_width, rel_margin * img_height]])
-    matrix = cv2.getPerspectiveTransform(old_corner_points, new_corner_points)
-    img_warped = cv2.warpPerspective(img, matrix, (img_width, img_height))
-    # cv2 warpPerspective seems to output the same dimensions as the input image,
-    # potentially skewing the image if the drawn corners are of a different aspect
-    # ratio than the original image.
-    # --> Add an additional transformation according to the drawn bounding box
-    #     aspect ratio in order to prevent skew in the original image
-    # TODO: see if there is a better way to do this (input params of warpPerspective?)
-    p1 = corner_points[0, 0, :]  # (points ordered anti-clockwise, starting from upper left)
-    p2 = corner_points[1, 0, :]
-    p3 = corner_points[2, 0, :]
-    p4 = corner_points[3, 0, :]
-    left_height = np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-    right_height = np.sqrt((p3[0] - p4[0])**2 + (p3[1] - p4[1])**2)
-    top_width = np.sqrt((p1[0] - p4[0])**2 + (p1[1] - p4[1])**2)
-    bottom_width = np.sqrt((p2[0] - p3[0])**2 + (p2[1] - p3[1])**2)
-
-    box_height = int(np.mean([left_height, right_height]))
-    box_width = int(np.mean([top_width, bottom_width]))
-    box_aspect_ratio = box_width / box_height
-    if box_aspect_ratio >= 1:
-        new_img_width = img_width
-        new_img_height = max(int(img_width / box_aspect_ratio), 1)  # avoid height=0
-    else:
-        new_img_width = max(int(box_aspect_ratio * img_height), 1)
-        new_img_height = img_height
-    img_warped_unskewed = cv2.resize(img_warped, (new_img_width, new_img_height), interpolation=cv2.INTER_AREA)
-    return img_warped_unskewed
-
-
-# reorder (for correct input to warping function
-def _reorder_corner_points(corner_points, order="anti-clockwise"):
-    """
-    Identify point position and order them accorading to the specified
-    order starting from the upper left corner
-    order: "anti-clockwise" | "clockwise"
-    """
-    # TODO: try to find a more robust way of categorising the corners
-    #       motivation: the box isn't drawn for oddly positioned points
-    #                   breaking with the non-robust method below
-    corner_points = corner_points.reshape((4, 2))
-    reordered_points = np.zeros((4, 1, 2), np.int32)
-
-    pair_sum = corner_points.sum(1)
-    pair_diff = -np.diff(corner_points, axis=1)
-
-    # sort points based on angle:
-    # (starting from upper_left to get correct orientation when warping image)
-    upper_left = corner_points[np.argmin(pair_sum)]
-    upper_left_angle = 0 if order == "clockwise" else 2 * np.pi
-    angles = [
-        np.arctan2((p[1] - upper_left[1]), (p[0] - upper_left[0])) + np.pi
-        if np.any(p != upper_left) else upper_left_angle
-        for p in corner_points
-    ]
-    if order == "anti-clockwise":
-        reverse = True
-    elif order == "clockwise":
-        reverse = False
-    else:
-        raise ValueError(f"Unknown order={repr(order)}. Allowed values: 'clockwise' or 'anti-clockwise' (default)")
-    reordered_points = np.stack([[p] for (_, p) in sorted(zip(angles, corner_points), key=lambda x: x[0], reverse=reverse)])
-    return reordered_points
-
-
-def get_image_exif_info(path: str) -> Dict:
-    def get_degrees(angles: Tuple[float, float, float]) -> float:
-        return angles[0] + (angles[1] / 60) + (angles[2] / 3600)
-    def format_degrees(angles: Tuple[float, float, float]) -> str:
-        return f"{int(angles[0])}\u00B0{int(angles[1])}'{angles[2]}\""
-    # def get_angles(degrees: float) -> Tuple[float, float, float]:
-    #     a0 = degrees // 1
-    #     r0 = (degrees % 1)
-    #     a1 = r0 * 60 // 1
-    #     r1 = r0 * 60 % 1
-    #     a2 = r1 * 60
-    #     return a0, a1, a2
-    extracted_info = {
-        "image_datetime": "",
-        "image_gps_latitude": "",
-        "image_gps_longitude": "",
-        # "image_gps_latitude_text": "",
-        # "image_gps_longitude_text": ""
-    }
-    with open(path, "rb") as f:
-        exif_img = exif.Image(f)
-        if exif_img.has_exif:
-            if hasattr(exif_img, "datetime"):
-                extracted_info["image_datetime"] = exif_img.datetime
-            if hasattr(exif_img, "gps_latitude"):
-                extracted_info["image_gps_latitude"] = f"{get_degrees(exif_img.gps_latitude):.5f}"
-                # extracted_info["image_gps_latitude_text"] = format_degrees(exif_img.gps_latitude)
-            if hasattr(exif_img, "gps_longitude"):
-                extracted_info["image_gps_longitude"] = f"{get_degrees(exif_img.gps_longitude):.5f}"
-                # extracted_info["image_gps_longitude_text"] = format_degrees(exif_img.gps_longitude)
-    # lo = exif_img.gps_latitude
-    # lo_s = format_degrees(lo)
-    # lo_f = get_degrees(lo)
-    # lo_2 = get_angles(lo_f)
-    #
-    # la = exif_img.gps_longitude
-    # la_s = format_degrees(la)
-    # la_f = get_degrees(la)
-    # la_2 = get_angles(la_f)
-    return extracted_info
+    # delete existing points, lines and labels:
+    if img_view.overlay is not None:
+        img_view.overlay.clear()
+    img_view.drawn_points = None
+
+
+def warp_image(img, corner_points, rel_margin: float, interpolation: int = cv2.INTER_LINEAR):
+    image_size = (img.shape[1], img.shape[0])
+    return BoxGeometry.from_corners(corner_points, image_size, rel_margin).warp(img, interpolation)
 
 
 if __name__ == "__main__":
+    # (configured here rather than on import, since worker processes import this module too, see Prefetcher)
+    logging.basicConfig(filename='logs.log',
+                        filemode='w',
+                        level=logging.INFO)
+    multiprocessing.freeze_support()  # (for executables made with pyinstaller)
     fm = FishMesh()
     fm.run()
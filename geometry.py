@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+
+
+@dataclass
+class BoxGeometry:
+    """
+    Perspective correction given by the reference box corners drawn on an image.
+
+    Coordinate spaces:
+    * image: pixel coordinates in the (unwarped) image the corners were drawn on
+    * warped: pixel coordinates in the warped image (box corners at the margin)
+    * relative: warped coordinates relative to the warped image size (0-1),
+      which is how ruler points are stored
+
+    Since all of these are given by the homography and the box dimensions,
+    points can be mapped and measured without warping any image.
+    """
+    corners: np.ndarray  # (4, 2) image coordinates, ordered anti-clockwise from upper left
+    image_size: Tuple[int, int]  # (width, height)
+    warped_size: Tuple[int, int]  # (width, height)
+    margin_ratio: float
+    homography: np.ndarray  # 3x3, image -> warped
+
+    @staticmethod
+    def from_corners(corner_points: np.ndarray, image_size: Tuple[int, int], margin_ratio: float) -> "BoxGeometry":
+        corner_points = reorder_corner_points(corner_points, "anti-clockwise")  # getPerspective expects anti-clockwise
+        img_width, img_height = image_size
+        # Warp directly to the size matching the drawn bounding box aspect ratio
+        # (warping to the original image size would skew the image if the drawn
+        # corners are of a different aspect ratio than the original image)
+        new_img_width, new_img_height = get_unskewed_image_size(corner_points, img_width, img_height)
+        old_corner_points = np.float32(corner_points)
+        new_corner_points = np.float32([
+            [margin_ratio * new_img_width, margin_ratio * new_img_height],
+            [margin_ratio * new_img_width, (1 - margin_ratio) * new_img_height],
+            [(1 - margin_ratio) * new_img_width, (1 - margin_ratio) * new_img_height],
+            [(1 - margin_ratio) * new_img_width, margin_ratio * new_img_height]])
+        return BoxGeometry(
+            corners=corner_points.reshape((4, 2)).astype(np.float64),
+            image_size=(img_width, img_height),
+            warped_size=(new_img_width, new_img_height),
+            margin_ratio=margin_ratio,
+            homography=cv2.getPerspectiveTransform(old_corner_points, new_corner_points),
+        )
+
+    def scaled(self, image_size: Tuple[int, int]) -> "BoxGeometry":
+        """The same box on a resized copy of the image (e.g. a preview)"""
+        scale = np.array(image_size, np.float64) / np.array(self.image_size, np.float64)
+        return BoxGeometry.from_corners(self.corners * scale, image_size, self.margin_ratio)
+
+    def warp(self, img, interpolation: int = cv2.INTER_LINEAR, source_transform: Optional[np.ndarray] = None):
+        """
+        source_transform: 3x3 transform from img to the image the corners were drawn on
+        (e.g. a rotation, see rotation_matrix()), applied in the same warp.
+        """
+        matrix = self.homography if source_transform is None else self.homography @ source_transform
+        return cv2.warpPerspective(img, matrix, self.warped_size, flags=interpolation)
+
+    def image_to_warped(self, points) -> np.ndarray:
+        points = np.asarray(points, np.float64).reshape((-1, 1, 2))
+        return cv2.perspectiveTransform(points, self.homography).reshape((-1, 2))
+
+    def warped_to_image(self, points) -> np.ndarray:
+        points = np.asarray(points, np.float64).reshape((-1, 1, 2))
+        return cv2.perspectiveTransform(points, np.linalg.inv(self.homography)).reshape((-1, 2))
+
+    def relative_to_warped(self, points) -> np.ndarray:
+        return np.asarray(points, np.float64).reshape((-1, 2)) * self.warped_size
+
+    def warped_to_relative(self, points) -> np.ndarray:
+        return np.asarray(points, np.float64).reshape((-1, 2)) / self.warped_size
+
+    def relative_to_image(self, points) -> np.ndarray:
+        return self.warped_to_image(self.relative_to_warped(points))
+
+    def image_to_relative(self, points) -> np.ndarray:
+        return self.warped_to_relative(self.image_to_warped(points))
+
+
+def rotation_matrix(quarter_turns: int, image_size: Tuple[int, int]) -> np.ndarray:
+    """
+    3x3 transform from pixel coordinates of an image of image_size (width, height)
+    to pixel coordinates of the image rotated clockwise quarter_turns * 90 degrees
+    (same pixel mapping as rotate_image()).
+    """
+    img_width, img_height = image_size
+    quarter_turns = quarter_turns % 4
+    if quarter_turns == 0:
+        return np.eye(3)
+    elif quarter_turns == 1:
+        return np.array([[0, -1, img_height - 1], [1, 0, 0], [0, 0, 1]], np.float64)
+    elif quarter_turns == 2:
+        return np.array([[-1, 0, img_width - 1], [0, -1, img_height - 1], [0, 0, 1]], np.float64)
+    else:
+        return np.array([[0, 1, 0], [-1, 0, img_width - 1], [0, 0, 1]], np.float64)
+
+
+def rotate_image(img, quarter_turns: int):
+    """Rotate img clockwise quarter_turns * 90 degrees"""
+    quarter_turns = quarter_turns % 4
+    if quarter_turns == 0:
+        return img
+    rotate_codes = {1: cv2.ROTATE_90_CLOCKWISE, 2: cv2.ROTATE_180, 3: cv2.ROTATE_90_COUNTERCLOCKWISE}
+    return cv2.rotate(img, rotate_codes[quarter_turns])
+
+
+def rotate_relative_points(points, quarter_turns: int) -> np.ndarray:
+    """Rotate points given relative to the image size (0-1) clockwise quarter_turns * 90 degrees"""
+    points = np.asarray(points, np.float64).reshape((-1, 2))
+    for _ in range(quarter_turns % 4):
+        points = np.stack([1 - points[:, 1], points[:, 0]], axis=1)
+    return points
+
+
+def rotated_size(image_size: Tuple[int, int], quarter_turns: int) -> Tuple[int, int]:
+    img_width, img_height = image_size
+    return (img_height, img_width) if quarter_turns % 2 else (img_width, img_height)
+
+
+def relative_to_cm_scale(margin_ratio: float, box_width: float, box_height: float) -> Tuple[float, float]:
+    """
+    cm per unit of coordinates relative to the warped image size, along x and y
+    (the box spans 1 - 2 * margin of the warped image)
+    """
+    img_to_box_scale_ratio = 1 / (1 - 2 * margin_ratio)
+    return img_to_box_scale_ratio * box_width, img_to_box_scale_ratio * box_height
+
+
+def get_unskewed_image_size(corner_points, img_width: int, img_height: int) -> Tuple[int, int]:
+    """
+    Get the size of the warped image, keeping the largest image dimension
+    and using the aspect ratio of the drawn bounding box.
+    corner_points: ordered anti-clockwise, starting from upper left
+    """
+    p1 = corner_points[0, 0, :]
+    p2 = corner_points[1, 0, :]
+    p3 = corner_points[2, 0, :]
+    p4 = corner_points[3, 0, :]
+    left_height = np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+    right_height = np.sqrt((p3[0] - p4[0])**2 + (p3[1] - p4[1])**2)
+    top_width = np.sqrt((p1[0] - p4[0])**2 + (p1[1] - p4[1])**2)
+    bottom_width = np.sqrt((p2[0] - p3[0])**2 + (p2[1] - p3[1])**2)
+
+    box_height = max(int(np.mean([left_height, right_height])), 1)  # avoid division by 0
+    box_width = int(np.mean([top_width, bottom_width]))
+    box_aspect_ratio = box_width / box_height
+    if box_aspect_ratio >= 1:
+        new_img_width = img_width
+        new_img_height = max(int(img_width / box_aspect_ratio), 1)  # avoid height=0
+    else:
+        new_img_width = max(int(box_aspect_ratio * img_height), 1)
+        new_img_height = img_height
+    return new_img_width, new_img_height
+
+
+# reorder (for correct input to warping function
+def reorder_corner_points(corner_points, order="anti-clockwise"):
+    """
+    Identify point position and order them accorading to the specified
+    order starting from the upper left corner
+    order: "anti-clockwise" | "clockwise"
+    """
+    # TODO: try to find a more robust way of categorising the corners
+    #       motivation: the box isn't drawn for oddly positioned points
+    #                   breaking with the non-robust method below
+    corner_points = corner_points.reshape((4, 2))
+
+    pair_sum = corner_points.sum(1)
+
+    # sort points based on angle:
+    # (starting from upper_left to get correct orientation when warping image)
+    upper_left = corner_points[np.argmin(pair_sum)]
+    upper_left_angle = 0 if order == "clockwise" else 2 * np.pi
+    angles = [
+        np.arctan2((p[1] - upper_left[1]), (p[0] - upper_left[0])) + np.pi
+        if np.any(p != upper_left) else upper_left_angle
+        for p in corner_points
+    ]
+    if order == "anti-clockwise":
+        reverse = True
+    elif order == "clockwise":
+        reverse = False
+    else:
+        raise ValueError(f"Unknown order={repr(order)}. Allowed values: 'clockwise' or 'anti-clockwise' (default)")
+    reordered_points = np.stack([[p] for (_, p) in sorted(zip(angles, corner_points), key=lambda x: x[0], reverse=reverse)])
+    return reordered_points
@@ -0,0 +1,62 @@
+from typing import Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+
+class PointIndex:
+    """
+    Nearest point queries on points drawn on a canvas (e.g. the draggable
+    corners and ruler endpoints), using a uniform grid of square cells.
+
+    Points are identified by keys (e.g. their overlay keys). A query only
+    looks at the cells within the search radius, so its cost doesn't depend
+    on the number of points or other canvas items. The grid is built on the
+    first query, so replacing the index on every redraw (e.g. while dragging)
+    is cheap.
+    """
+    def __init__(self, keys: Sequence[Hashable], points, cell_size: float):
+        self.keys = list(keys)
+        self.points = np.asarray(points, np.float64).reshape((-1, 2))
+        self.cell_size = cell_size
+        self._cells: Optional[Dict[int, np.ndarray]] = None  # cell code -> point indices
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _build(self):
+        self._cells = {}
+        if not len(self.keys):
+            return
+        cells = np.floor(self.points / self.cell_size).astype(np.int64)
+        codes = cell_code(cells[:, 0], cells[:, 1])
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        # Point indices grouped by cell:
+        order = np.argsort(inverse, kind="stable")
+        splits = np.cumsum(np.bincount(inverse))[:-1]
+        self._cells = dict(zip(unique_codes.tolist(), np.split(order, splits)))
+
+    def nearest(self, x: float, y: float, radius: float) -> Optional[Hashable]:
+        """Key of the point closest to x, y, if within radius (otherwise None)"""
+        if self._cells is None:
+            self._build()
+        min_x, min_y = np.floor((x - radius) / self.cell_size), np.floor((y - radius) / self.cell_size)
+        max_x, max_y = np.floor((x + radius) / self.cell_size), np.floor((y + radius) / self.cell_size)
+        codes = (
+            cell_code(cell_x, cell_y)
+            for cell_x in range(int(min_x), int(max_x) + 1)
+            for cell_y in range(int(min_y), int(max_y) + 1)
+        )
+        candidates = [self._cells[code] for code in codes if code in self._cells]
+        if not candidates:
+            return None
+        candidates = np.concatenate(candidates)
+        distances = np.hypot(*(self.points[candidates] - (x, y)).T)
+        closest = np.argmin(distances)
+        if distances[closest] > radius:
+            return None
+        return self.keys[candidates[closest]]
+
+
+def cell_code(cell_x, cell_y):
+    """A single integer identifying a grid cell (works on arrays)"""
+    return cell_x * 2 ** 32 + cell_y
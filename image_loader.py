@@ -0,0 +1,215 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+from PIL import Image
+
+from memory import fit_to_memory_budget
+from geometry import rotate_image
+from image_metadata import ImageMetadata, read_image_metadata
+
+
+logger = logging.getLogger(__name__)
+
+# JPEG images can be decoded directly at a reduced scale (using DCT scaling),
+# which is a lot faster than decoding the full image and resizing it:
+REDUCED_DECODE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+# EXIF orientation -> clockwise quarter turns needed to show the image upright
+# (the mirrored orientations 2, 4, 5 and 7 are left to the decoder)
+EXIF_ORIENTATION_ROTATIONS = {1: 0, 6: 1, 3: 2, 8: 3}
+
+
+class ImageLoadError(Exception):
+    pass
+
+
+@dataclass
+class LoadedImage:
+    request_id: int
+    path: str
+    stage: str  # "preview" | "full" | "error"
+    img: Optional[np.ndarray] = None
+    image_size: Optional[Tuple[int, int]] = None  # (width, height) of the full resolution image (unrotated)
+    rotation: int = 0  # clockwise quarter turns to show the full resolution image upright
+    metadata: Optional[ImageMetadata] = None  # (read from the file header, so it's available with the preview)
+    error: Optional[Exception] = None
+
+
+# A prefetched image: preview, full resolution image (None if only the preview
+# has been prefetched), image size, rotation and metadata (see LoadedImage):
+PrefetchedImage = Tuple[np.ndarray, Optional[np.ndarray], Tuple[int, int], int, ImageMetadata]
+
+
+class ImageLoader:
+    """
+    Decodes images in a worker thread, so the window stays responsive.
+
+    For every load, first a "preview" (at most preview_size pixels wide/high)
+    and then the "full" resolution image is put on the results queue (or an
+    "error"). The EXIF orientation isn't applied to the full resolution image,
+    but is given as a rotation (already applied to the preview). A full resolution image larger than the memory budget is given
+    as a memory mapped array. tkinter isn't thread safe, so the results must be fetched from
+    the queue on the tkinter thread (e.g. polling with window.after()).
+    """
+    def __init__(self):
+        self.results: "queue.Queue[LoadedImage]" = queue.Queue()
+        self._request_id = 0
+
+    def load(
+        self,
+        path: str,
+        preview_size: int,
+        memory_budget_mb: float = 0,
+        prefetched: Optional[Callable[[], PrefetchedImage]] = None,
+    ) -> int:
+        """
+        prefetched: gives the image if it has been prefetched (waiting for it if it's still
+        being decoded, see prefetch.Prefetcher), otherwise (or if that fails) it's decoded here
+        """
+        self._request_id += 1
+        threading.Thread(
+            target=self._load,
+            args=(self._request_id, path, preview_size, memory_budget_mb, prefetched),
+            daemon=True,
+        ).start()
+        return self._request_id
+
+    def cancel(self):
+        """Ignore the remaining results of the current load"""
+        self._request_id += 1
+
+    def is_current(self, result: LoadedImage) -> bool:
+        """False for results of a load that has been replaced by a newer one"""
+        return result.request_id == self._request_id
+
+    def _load(
+        self,
+        request_id: int,
+        path: str,
+        preview_size: int,
+        memory_budget_mb: float,
+        prefetched: Optional[Callable[[], PrefetchedImage]],
+    ):
+        try:
+            if prefetched is not None:
+                try:
+                    preview, img, image_size, rotation, metadata = prefetched()
+                except Exception as e:
+                    logger.info(f"Prefetching {path} failed, decoding it again: {e}")
+                else:
+                    self.results.put(LoadedImage(request_id, path, "preview", preview, image_size, rotation, metadata))
+                    if img is None:  # (only the preview is prefetched with a memory budget)
+                        decode_flags, _ = orientation_decode(metadata.orientation)
+                        img = decode_image(path, cv2.IMREAD_COLOR | decode_flags)
+                        logger.info(f"Decoded full resolution image of {path}")
+                    img = fit_to_memory_budget(img, memory_budget_mb)
+                    self.results.put(LoadedImage(request_id, path, "full", img, image_size, rotation, metadata))
+                    return
+            stored_size, image_format = read_image_header(path)
+            metadata = read_image_metadata(path)
+            decode_flags, rotation = orientation_decode(metadata.orientation)
+            image_size = stored_size[::-1] if metadata.orientation in (5, 7) else stored_size
+            reduced = decode_reduced_image(path, image_format, image_size, preview_size, decode_flags)
+            if reduced is not None:
+                preview = rotate_image(create_preview_image(reduced, preview_size), rotation)
+                self.results.put(LoadedImage(request_id, path, "preview", preview, image_size, rotation, metadata))
+            img = decode_image(path, cv2.IMREAD_COLOR | decode_flags)
+            image_size = (img.shape[1], img.shape[0])
+            logger.info(f"Decoded full resolution image of {path}")
+            if reduced is None:
+                preview = rotate_image(create_preview_image(img, preview_size), rotation)
+                self.results.put(LoadedImage(request_id, path, "preview", preview, image_size, rotation, metadata))
+            img = fit_to_memory_budget(img, memory_budget_mb)
+            self.results.put(LoadedImage(request_id, path, "full", img, image_size, rotation, metadata))
+        except Exception as e:
+            self.results.put(LoadedImage(request_id, path, "error", error=e))
+
+
+def decode_image(path: str, flags: int = cv2.IMREAD_COLOR):
+    """
+    Decode image in the BGR color order used by OpenCV (the image is kept in
+    BGR, only the small images shown on screen are converted to RGB for PIL)
+    """
+    img = cv2.imread(path, flags)
+    if img is None:
+        raise ImageLoadError(f"Unable to decode image file {repr(path)}")
+    return img
+
+
+def decode_full_image(path: str, orientation: int) -> Tuple[np.ndarray, int]:
+    """
+    Decode the full resolution image the same way as ImageLoader (e.g. for re-rendering
+    exports without the window), with the clockwise quarter turns to show it upright
+    orientation: the EXIF orientation (see ImageMetadata)
+    """
+    decode_flags, rotation = orientation_decode(orientation)
+    return decode_image(path, cv2.IMREAD_COLOR | decode_flags), rotation
+
+
+def orientation_decode(orientation: int) -> Tuple[int, int]:
+    """
+    Decode flags and clockwise quarter turns for an EXIF orientation: rotations are
+    done by fish-mesh (lazily, see geometry.rotation_matrix()), the rest by the decoder
+    """
+    if orientation in EXIF_ORIENTATION_ROTATIONS:
+        return cv2.IMREAD_IGNORE_ORIENTATION, EXIF_ORIENTATION_ROTATIONS[orientation]
+    return 0, 0
+
+
+def read_image_header(path: str) -> Tuple[Tuple[int, int], str]:
+    """
+    Get the stored (width, height) and the image format without decoding the pixels
+    (the EXIF orientation is part of the metadata, see read_image_metadata())
+    """
+    with Image.open(path) as img:
+        return img.size, img.format
+
+
+def decode_reduced_image(
+    path: str, image_format: str, image_size: Tuple[int, int], preview_size: int, flags: int = 0
+) -> Optional[np.ndarray]:
+    """
+    The image decoded at the largest reduced scale that still gives a preview of
+    preview_size (see choose_decode_reduction()), or None if it can't be decoded
+    at a reduced scale (only JPEG images can)
+    """
+    reduction = choose_decode_reduction(image_size, preview_size) if image_format == "JPEG" else None
+    if reduction is None:
+        return None
+    img = decode_image(path, REDUCED_DECODE_FLAGS[reduction] | flags)
+    logger.info(f"Decoded preview of {path} at 1/{reduction} scale")
+    return img
+
+
+def choose_decode_reduction(image_size: Tuple[int, int], preview_size: int) -> Optional[int]:
+    """The largest reduced decode scale that still gives an image of at least preview_size"""
+    for reduction in sorted(REDUCED_DECODE_FLAGS, reverse=True):
+        if max(image_size) / reduction >= preview_size:
+            return reduction
+    return None
+
+
+def create_preview_image(img, max_size: int):
+    """Downscale img (if needed) such that its largest dimension is at most max_size"""
+    img_height, img_width = img.shape[:2]
+    preview_size = preview_image_size((img_width, img_height), max_size)
+    if preview_size == (img_width, img_height):
+        return img
+    return cv2.resize(img, preview_size, interpolation=cv2.INTER_AREA)
+
+
+def preview_image_size(image_size: Tuple[int, int], max_size: int) -> Tuple[int, int]:
+    """(width, height) of the preview of an image of image_size (see create_preview_image())"""
+    img_width, img_height = image_size
+    scaling = max_size / max(img_width, img_height)
+    if scaling >= 1:
+        return img_width, img_height
+    return max(int(img_width * scaling), 1), max(int(img_height * scaling), 1)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+EXIF metadata (date and time, GPS position, orientation and camera model) read
+from just the APP1 segment at the start of a JPEG file, without decoding pixels
+or reading the rest of the file.
+
+A folder can be scanned in parallel, e.g. to check the dates of a day's photos:
+
+Usage: python image_metadata.py FOLDER [--output metadata.csv] [--workers N]
+"""
+import argparse
+import csv
+import logging
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# JPEG markers:
+START_OF_IMAGE = b"\xff\xd8"
+APP1 = 0xE1
+START_OF_SCAN = 0xDA
+END_OF_IMAGE = 0xD9
+# Markers without a segment length (TEM and RST0-7):
+STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+EXIF_HEADER = b"Exif\x00\x00"
+# TIFF tags:
+MODEL_TAG = 0x0110
+ORIENTATION_TAG = 0x0112
+DATETIME_TAG = 0x0132
+GPS_IFD_TAG = 0x8825
+GPS_LATITUDE_TAG = 0x0002
+GPS_LONGITUDE_TAG = 0x0004
+# TIFF field type -> (struct format, size in bytes) of a value
+# (types not listed, e.g. UNDEFINED, aren't needed and are skipped):
+FIELD_TYPES = {
+    2: ("s", 1),  # ASCII
+    3: ("H", 2),  # SHORT
+    4: ("I", 4),  # LONG
+    5: ("II", 8),  # RATIONAL
+}
+
+
+@dataclass
+class ImageMetadata:
+    datetime: str = ""  # as given in the EXIF data, "YYYY:MM:DD HH:MM:SS"
+    gps_latitude: Optional[float] = None  # degrees
+    gps_longitude: Optional[float] = None  # degrees
+    orientation: int = 1
+    model: str = ""  # camera model
+
+    def image_info(self) -> Dict[str, str]:
+        """The image information columns of the measurements (see export.measurement_rows())"""
+        return {
+            "image_datetime": self.datetime,
+            "image_gps_latitude": "" if self.gps_latitude is None else f"{self.gps_latitude:.5f}",
+            "image_gps_longitude": "" if self.gps_longitude is None else f"{self.gps_longitude:.5f}",
+        }
+
+
+def read_image_metadata(path: str) -> ImageMetadata:
+    """
+    The EXIF metadata of an image (empty if it has none, e.g. if it isn't a JPEG image,
+    or if it's invalid: the image might still be decodable)
+    """
+    try:
+        with open(path, "rb") as f:
+            tiff = read_exif_segment(f)
+        if tiff is None:
+            return ImageMetadata()
+        return parse_exif(tiff)
+    except (struct.error, IndexError, ValueError) as e:
+        logger.warning(f"Ignoring invalid EXIF data of {path}: {e}")
+        return ImageMetadata()
+
+
+def read_exif_segment(f: BinaryIO) -> Optional[bytes]:
+    """
+    The TIFF structured data of the EXIF APP1 segment of a JPEG file (only the segment
+    headers are read before it), or None if there is none or the headers are invalid
+    """
+    if f.read(2) != START_OF_IMAGE:
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        while marker[1] == 0xFF:  # (fill bytes)
+            next_byte = f.read(1)
+            if not next_byte:
+                return None
+            marker = marker[1:] + next_byte
+        if marker[1] in (START_OF_SCAN, END_OF_IMAGE):
+            return None  # the metadata segments come before the image data
+        if marker[1] in STANDALONE_MARKERS:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0] - 2  # (the length includes itself)
+        if length < 0:
+            return None
+        if marker[1] == APP1:
+            segment = f.read(length)
+            if segment.startswith(EXIF_HEADER):
+                return segment[len(EXIF_HEADER):]
+        else:
+            f.seek(length, os.SEEK_CUR)
+
+
+def parse_exif(tiff: bytes) -> ImageMetadata:
+    if tiff[:2] == b"II":
+        byte_order = "<"
+    elif tiff[:2] == b"MM":
+        byte_order = ">"
+    else:
+        raise ValueError("unknown byte order")
+    ifd0_offset = struct.unpack_from(byte_order + "I", tiff, 4)[0]
+    ifd0 = read_ifd(tiff, ifd0_offset, byte_order)
+    metadata = ImageMetadata(
+        datetime=ifd0.get(DATETIME_TAG, ""),
+        orientation=ifd0.get(ORIENTATION_TAG, (1,))[0],
+        model=ifd0.get(MODEL_TAG, ""),
+    )
+    if GPS_IFD_TAG in ifd0:
+        gps_ifd = read_ifd(tiff, ifd0[GPS_IFD_TAG][0], byte_order)
+        # (degrees, minutes, seconds; the hemisphere is not applied)
+        if len(gps_ifd.get(GPS_LATITUDE_TAG, ())) == 3:
+            metadata.gps_latitude = get_degrees(gps_ifd[GPS_LATITUDE_TAG])
+        if len(gps_ifd.get(GPS_LONGITUDE_TAG, ())) == 3:
+            metadata.gps_longitude = get_degrees(gps_ifd[GPS_LONGITUDE_TAG])
+    return metadata
+
+
+def read_ifd(tiff: bytes, offset: int, byte_order: str) -> Dict:
+    """
+    Tag -> value of the entries of an image file directory (IFD) of supported types:
+    a string for ASCII, and a tuple of numbers for the others
+    """
+    num_entries = struct.unpack_from(byte_order + "H", tiff, offset)[0]
+    entries = {}
+    for entry_offset in range(offset + 2, offset + 2 + 12 * num_entries, 12):
+        tag, field_type, count = struct.unpack_from(byte_order + "HHI", tiff, entry_offset)
+        if field_type not in FIELD_TYPES:
+            continue
+        value_format, value_size = FIELD_TYPES[field_type]
+        # Values of up to 4 bytes are stored in the entry, larger values at an offset:
+        value_offset = entry_offset + 8
+        if value_size * count > 4:
+            value_offset = struct.unpack_from(byte_order + "I", tiff, value_offset)[0]
+        if value_offset + value_size * count > len(tiff):
+            raise ValueError(f"value of tag {tag:#06x} outside of the EXIF data")
+        if field_type == 2:
+            text = tiff[value_offset:value_offset + count].split(b"\x00")[0]
+            entries[tag] = text.decode("ascii", "replace").strip()
+        elif field_type == 5:
+            numbers = struct.unpack_from(f"{byte_order}{2 * count}I", tiff, value_offset)
+            entries[tag] = tuple(
+                numerator / denominator if denominator else 0.0
+                for numerator, denominator in zip(numbers[::2], numbers[1::2])
+            )
+        else:
+            entries[tag] = struct.unpack_from(f"{byte_order}{count}{value_format}", tiff, value_offset)
+    return entries
+
+
+def get_degrees(angles: Tuple[float, float, float]) -> float:
+    return angles[0] + (angles[1] / 60) + (angles[2] / 3600)
+
+
+def scan_folder(folder: Path, max_workers: Optional[int] = None) -> Dict[Path, ImageMetadata]:
+    """
+    The metadata of all JPEG images in folder, read in parallel (reading the headers is
+    mostly waiting for the disk, so threads are enough)
+    """
+    paths = sorted(path for path in Path(folder).iterdir() if path.suffix.lower() in (".jpg", ".jpeg"))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(safe_read_image_metadata, paths)))
+
+
+def safe_read_image_metadata(path: Path) -> ImageMetadata:
+    try:
+        return read_image_metadata(str(path))
+    except (OSError, struct.error, IndexError, ValueError) as e:
+        logger.warning(f"Unable to read {path}: {e}")
+        return ImageMetadata()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the EXIF metadata of all JPEG images in a folder")
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--output", type=Path, help="CSV file to write (default: print to the console)")
+    parser.add_argument("--workers", type=int, default=32, help="number of files read at the same time")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    metadata = scan_folder(args.folder, args.workers)
+    rows: List[Dict] = [dict(file=path.name, **asdict(image_metadata)) for path, image_metadata in metadata.items()]
+    f = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(f, fieldnames=["file", *(field.name for field in fields(ImageMetadata))])
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if args.output:
+            f.close()
+    print(f"Read the metadata of {len(rows)} images in {time.perf_counter() - start_time:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import logging
+import sys
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def fit_to_memory_budget(img: np.ndarray, memory_budget_mb: float) -> np.ndarray:
+    """
+    Move img to a memory mapped scratch file if it's larger than the memory
+    budget (0 means no budget). The pixels are then read from disk (through
+    the OS page cache) when needed, instead of being kept in RAM.
+    """
+    if not memory_budget_mb or img.nbytes <= memory_budget_mb * 1024 ** 2 or isinstance(img, np.memmap):
+        return img
+    # The scratch file is deleted when closed (the memory map keeps its own handle to it)
+    with tempfile.TemporaryFile(prefix="fish-mesh-") as scratch_file:
+        scratch = np.memmap(scratch_file, dtype=img.dtype, mode="w+", shape=img.shape)
+    scratch[:] = img
+    scratch.flush()
+    logger.info(
+        f"Image of {img.nbytes / 1024 ** 2:.0f} MB exceeds memory budget of"
+        f" {memory_budget_mb:.0f} MB, moved to memory mapped scratch file"
+    )
+    return scratch
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size (physical memory used) of the process"""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize / 1024 ** 2
+    import resource
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS, and kilobytes on linux:
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def log_peak_rss(context: str):
+    peak_rss = peak_rss_mb()
+    if peak_rss is not None:
+        logger.info(f"Peak memory usage (RSS) {context}: {peak_rss:.0f} MB")
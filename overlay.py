@@ -0,0 +1,86 @@
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+import tkinter as tk
+
+
+class CanvasOverlay:
+    """
+    Retained-mode drawing layer on top of a tkinter canvas.
+
+    Every drawn item is identified by a key (a tuple starting with a group name,
+    e.g. ("corner", 2) or ("ruler_line", 7)). Drawing a key that already exists
+    moves/reconfigures the existing canvas item (coords/itemconfig) instead of
+    deleting and recreating it, so redraws only create or delete items when the
+    set of keys changes (e.g. when rulers are added or removed).
+    """
+    def __init__(self, canvas: tk.Canvas):
+        self.canvas = canvas
+        self._items: Dict[Tuple, int] = {}
+        self._kinds: Dict[Tuple, str] = {}
+        self._coords: Dict[Tuple, Tuple[float, ...]] = {}
+        self._options: Dict[Tuple, Dict] = {}
+
+    def line(self, key: Tuple, coords: Iterable[float], **options) -> int:
+        return self._draw(key, "line", tuple(coords), options)
+
+    def oval(self, key: Tuple, x: float, y: float, radius: float, **options) -> int:
+        return self._draw(key, "oval", (x - radius, y - radius, x + radius, y + radius), options)
+
+    def text(self, key: Tuple, x: float, y: float, **options) -> int:
+        return self._draw(key, "text", (x, y), options)
+
+    def _draw(self, key: Tuple, kind: str, coords: Tuple[float, ...], options: Dict) -> int:
+        item = self._items.get(key)
+        if item is not None and self._kinds[key] != kind:
+            # key reused for another item type; can't be updated in place
+            self.delete(key)
+            item = None
+        if item is None:
+            item = getattr(self.canvas, f"create_{kind}")(*coords, **options)
+            self._items[key] = item
+            self._kinds[key] = kind
+        else:
+            if self._coords[key] != coords:
+                self.canvas.coords(item, *coords)
+            changed_options = {
+                name: value for name, value in options.items()
+                if self._options[key].get(name) != value
+            }
+            if changed_options:
+                self.canvas.itemconfig(item, **changed_options)
+        self._coords[key] = coords
+        self._options[key] = options
+        return item
+
+    def get(self, key: Tuple) -> Optional[int]:
+        return self._items.get(key)
+
+    def center(self, key: Tuple) -> Tuple[float, float]:
+        """Center of the bounding box of a drawn item (e.g. the position of a point)"""
+        coords = self._coords[key]
+        xs = coords[0::2]
+        ys = coords[1::2]
+        return (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+
+    def keys(self, group: Optional[Hashable] = None):
+        if group is None:
+            return list(self._items)
+        return [key for key in self._items if key[0] == group]
+
+    def delete(self, key: Tuple):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.canvas.delete(item)
+            del self._kinds[key]
+            del self._coords[key]
+            del self._options[key]
+
+    def delete_group(self, group: Hashable, keep: Iterable[Tuple] = ()):
+        """Delete all items of a group, except the ones with keys in keep"""
+        keep = set(keep)
+        for key in self.keys(group):
+            if key not in keep:
+                self.delete(key)
+
+    def clear(self):
+        for key in list(self._items):
+            self.delete(key)
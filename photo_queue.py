@@ -0,0 +1,81 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
+# The status of the photos is kept in this file in the folder, so work can be resumed later:
+QUEUE_FILE_NAME = "fish-mesh-queue.json"
+STATUSES = ("todo", "done", "skipped")
+
+
+class PhotoQueue:
+    """
+    The photos of a folder, worked through one at a time (in the order of their
+    names), with a status per photo: "todo", "done" (measurements saved) or
+    "skipped" (moved on from without saving).
+    """
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.paths: List[Path] = sorted(
+            path for path in self.folder.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES
+        )
+        self.statuses: Dict[str, str] = {}  # photo name -> status (only if not "todo")
+        queue_file = self.folder / QUEUE_FILE_NAME
+        if queue_file.exists():
+            try:
+                with open(queue_file) as f:
+                    self.statuses = {
+                        name: status for name, status in json.loads(f.read()).items() if status in STATUSES
+                    }
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Ignoring invalid queue file {queue_file}:")
+                logger.exception(e)
+        # Continue from the first photo not done yet:
+        self.index = next((i for i, path in enumerate(self.paths) if self.status(path) == "todo"), 0)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def current(self) -> Path:
+        return self.paths[self.index]
+
+    def move(self, step: int) -> bool:
+        """Move step photos forward (or back), if there are any"""
+        if not 0 <= self.index + step < len(self.paths):
+            return False
+        self.index += step
+        return True
+
+    def upcoming(self, count: int) -> List[Path]:
+        """The photos most likely to be opened next: the next count photos, and the previous photo"""
+        neighbours = self.paths[self.index + 1:self.index + 1 + count]
+        if count and self.index > 0:
+            neighbours.append(self.paths[self.index - 1])
+        return neighbours
+
+    def status(self, path: Path) -> str:
+        return self.statuses.get(Path(path).name, "todo")
+
+    def set_status(self, path: Path, status: str):
+        if status == "todo":
+            self.statuses.pop(Path(path).name, None)
+        else:
+            self.statuses[Path(path).name] = status
+        with open(self.folder / QUEUE_FILE_NAME, "w") as f:
+            f.write(json.dumps(self.statuses, indent=4))
+
+    def summary(self) -> str:
+        """e.g. "3/120 (done 2, skipped 1)\""""
+        counts = {status: 0 for status in STATUSES}
+        for path in self.paths:
+            counts[self.status(path)] += 1
+        return f"{self.index + 1}/{len(self.paths)} (done {counts['done']}, skipped {counts['skipped']})"
+
+    def find(self, path) -> Optional[int]:
+        """Index of the photo at path, or None if it isn't in the queue"""
+        return next((i for i, p in enumerate(self.paths) if p == Path(path)), None)
@@ -0,0 +1,193 @@
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2.cv2 as cv2
+
+from geometry import rotate_image, rotated_size
+from image_loader import (
+    PrefetchedImage, create_preview_image, decode_image, decode_reduced_image, orientation_decode,
+    preview_image_size, read_image_header,
+)
+from image_metadata import ImageMetadata, read_image_metadata
+from memory import fit_to_memory_budget
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Prefetch:
+    future: Future
+    img_block: Optional[SharedMemory]  # (None if only the preview is prefetched)
+    img_shape: Tuple[int, int, int]
+    preview_block: SharedMemory
+    preview_shape: Tuple[int, int, int]
+    image_size: Tuple[int, int]  # (width, height) of the full resolution image (unrotated)
+    rotation: int
+    metadata: ImageMetadata  # (read here, as the image size depends on the orientation)
+
+
+class Prefetcher:
+    """
+    Decodes the photos that are likely to be opened next (e.g. the next photos of a
+    folder, see PhotoQueue), and their previews, in a pool of worker processes.
+
+    The pixels are handed over through shared memory blocks allocated by this
+    process (the image sizes are read from the file headers), so they aren't
+    pickled through a pipe. With a memory budget (see memory.fit_to_memory_budget()),
+    only the previews are prefetched, so no full resolution images are kept in RAM
+    in advance. A block is released as soon as its image is read (see read_prefetch()),
+    or when it's no longer needed. Only used from the tkinter thread.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._prefetches: Dict[str, Prefetch] = {}  # path -> prefetch
+
+    def prefetch(self, paths: List[str], preview_size: int, memory_budget_mb: float = 0):
+        """Decode paths in the background (and drop prefetched photos not in paths)"""
+        for path in list(self._prefetches):
+            if path not in paths:
+                self._discard(self._prefetches.pop(path))
+        for path in paths:
+            if path not in self._prefetches:
+                try:
+                    self._prefetches[path] = self._start(path, preview_size, memory_budget_mb)
+                except Exception as e:
+                    # (the error is shown if the photo is opened)
+                    logger.info(f"Not prefetching {path}: {e}")
+
+    def take(self, path: str) -> Optional[Prefetch]:
+        """
+        The prefetch of path, if it has been (or is being) prefetched. It's then up to
+        the caller to read it with read_prefetch(), which waits for it to be decoded.
+        """
+        prefetch = self._prefetches.pop(path, None)
+        if prefetch is None:
+            return None
+        if prefetch.future.done() and prefetch.future.exception() is not None:
+            self._discard(prefetch)
+            return None
+        return prefetch
+
+    def shutdown(self):
+        for prefetch in self._prefetches.values():
+            prefetch.future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        for prefetch in self._prefetches.values():
+            release_blocks(prefetch)
+        self._prefetches = {}
+
+    def _start(self, path: str, preview_size: int, memory_budget_mb: float) -> Prefetch:
+        stored_size, image_format = read_image_header(path)
+        metadata = read_image_metadata(path)
+        _, rotation = orientation_decode(metadata.orientation)
+        # Decoded size (see ImageLoader):
+        image_width, image_height = stored_size[::-1] if metadata.orientation in (5, 7) else stored_size
+        preview_width, preview_height = rotated_size(
+            preview_image_size((image_width, image_height), preview_size), rotation
+        )
+        img_shape = (image_height, image_width, 3)
+        preview_shape = (preview_height, preview_width, 3)
+        img_block = None if memory_budget_mb else SharedMemory(create=True, size=int(np.prod(img_shape)))
+        preview_block = SharedMemory(create=True, size=int(np.prod(preview_shape)))
+        if self._executor is None:
+            # (spawned rather than forked, since the window has threads running)
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        future = self._executor.submit(
+            decode_to_shared_memory,
+            path,
+            image_format,
+            metadata.orientation,
+            preview_size,
+            None if img_block is None else img_block.name,
+            img_shape,
+            preview_block.name,
+            preview_shape,
+        )
+        return Prefetch(
+            future, img_block, img_shape, preview_block, preview_shape, (image_width, image_height), rotation, metadata
+        )
+
+    def _discard(self, prefetch: Prefetch):
+        # The blocks can't be released while a worker is still writing to them:
+        prefetch.future.cancel()
+        prefetch.future.add_done_callback(lambda future: release_blocks(prefetch))
+
+
+def read_prefetch(prefetch: Prefetch, memory_budget_mb: float = 0) -> PrefetchedImage:
+    """
+    The preview, full resolution image (None if only the preview has been prefetched),
+    image size, rotation and metadata of a prefetched image (see Prefetcher.take()),
+    waiting for it to be decoded. Its shared memory blocks are released.
+    """
+    try:
+        prefetch.future.result()  # (raises if decoding failed)
+        preview = copy_from_shared_memory(prefetch.preview_block, prefetch.preview_shape)
+        img = None
+        if prefetch.img_block is not None:
+            img = copy_from_shared_memory(prefetch.img_block, prefetch.img_shape, memory_budget_mb)
+    finally:
+        release_blocks(prefetch)
+    return preview, img, prefetch.image_size, prefetch.rotation, prefetch.metadata
+
+
+def copy_from_shared_memory(block: SharedMemory, shape: Tuple[int, int, int], memory_budget_mb: float = 0) -> np.ndarray:
+    """
+    Copy of an image in a shared memory block (so the block can be released),
+    moved directly to a scratch file if it's larger than the memory budget
+    """
+    shared = np.ndarray(shape, np.uint8, buffer=block.buf)
+    img = fit_to_memory_budget(shared, memory_budget_mb)
+    if img is shared:
+        img = shared.copy()
+    del shared  # (the block can't be closed while viewed)
+    return img
+
+
+def release_blocks(prefetch: Prefetch):
+    for block in (prefetch.img_block, prefetch.preview_block):
+        if block is not None:
+            block.close()
+            block.unlink()
+
+
+def decode_to_shared_memory(
+    path: str,
+    image_format: str,
+    orientation: int,
+    preview_size: int,
+    img_block_name: Optional[str],
+    img_shape: Tuple[int, int, int],
+    preview_block_name: str,
+    preview_shape: Tuple[int, int, int],
+):
+    """
+    Decode the image and its preview into the given shared memory blocks (runs in a worker process).
+    Without img_block_name, only the preview is decoded (at a reduced scale if possible, see ImageLoader).
+    image_format, orientation: as read from the file header by Prefetcher._start()
+    """
+    decode_flags, rotation = orientation_decode(orientation)
+    img = None
+    if img_block_name is None:
+        img = decode_reduced_image(path, image_format, (img_shape[1], img_shape[0]), preview_size, decode_flags)
+    if img is None:
+        img = decode_image(path, cv2.IMREAD_COLOR | decode_flags)
+    preview = rotate_image(create_preview_image(img, preview_size), rotation)
+    arrays = [(preview_block_name, preview_shape, preview)]
+    if img_block_name is not None:
+        arrays.append((img_block_name, img_shape, img))
+    for block_name, shape, array in arrays:
+        if array.shape != shape:
+            raise ValueError(f"Decoded image of {path} is of shape {array.shape}, expected {shape}")
+        block = SharedMemory(name=block_name)
+        shared = np.ndarray(shape, np.uint8, buffer=block.buf)
+        shared[:] = array
+        del shared  # (the block can't be closed while viewed)
+        block.close()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Session results store: the measurements of all photos saved to a folder, kept in
+one SQLite database (fish-mesh-results.sqlite) that every save appends its rows to.
+
+At the end of the day, the rows can be exported to one consolidated workbook:
+
+Usage: python results_store.py DATABASE_OR_FOLDER [--output FILE.xlsx] [--date YYYY-MM-DD]
+"""
+import argparse
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+RESULTS_DATABASE_NAME = "fish-mesh-results.sqlite"
+# Columns of the measurements (as given by export.measurement_rows()), in the order of the workbook:
+COLUMNS = [
+    "image_file",
+    "image_datetime",
+    "image_gps_latitude",
+    "image_gps_longitude",
+    "box_width_cm",
+    "box_height_cm",
+    "measurement_id",
+    "length_cm",
+]
+
+
+class ResultsStore:
+    """
+    Append-only store of the measurements of a session. Every save is one small
+    transaction (replacing the rows of the image, if saved before), indexed by the
+    image file, so saving doesn't get slower as the store grows. A connection is
+    opened per save, so the store can be written from any thread.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS measurements ("
+                " image_file TEXT NOT NULL,"
+                " image_datetime TEXT,"
+                " image_gps_latitude TEXT,"
+                " image_gps_longitude TEXT,"
+                " box_width_cm REAL,"
+                " box_height_cm REAL,"
+                " measurement_id INTEGER NOT NULL,"
+                " length_cm REAL,"
+                " saved_at TEXT NOT NULL,"
+                " PRIMARY KEY (image_file, measurement_id)"
+                ")"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path))
+        # (appending to a write-ahead log is cheaper than rewriting pages of the database)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def save(self, image_file: str, rows: List[Dict]):
+        """Store the measurement rows of an image, replacing any rows stored for it before"""
+        saved_at = datetime.now().isoformat(timespec="seconds")
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM measurements WHERE image_file = ?", (image_file,))
+            connection.executemany(
+                f"INSERT INTO measurements ({', '.join(COLUMNS)}, saved_at)"
+                f" VALUES ({', '.join(':' + column for column in COLUMNS)}, :saved_at)",
+                [dict(row, image_file=image_file, saved_at=saved_at) for row in rows],
+            )
+
+    def export_workbook(self, path: Path, day: Optional[date] = None) -> int:
+        """
+        Write all stored measurements (or only those saved on day) to one workbook.
+        Returns the number of rows written.
+        """
+        from pandas import read_sql_query  # (only needed here, so not imported on startup)
+
+        query = f"SELECT {', '.join(COLUMNS)}, saved_at FROM measurements"
+        parameters = ()
+        if day is not None:
+            query += " WHERE saved_at LIKE ?"
+            parameters = (f"{day.isoformat()}%",)
+        query += " ORDER BY saved_at, image_file, measurement_id"
+        with closing(self._connect()) as connection:
+            df = read_sql_query(query, connection, params=parameters)
+        df.to_excel(str(path), index=False, float_format="%.1f")
+        return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the fish-mesh results of a session to one workbook")
+    parser.add_argument("database", type=Path, help=f"results database, or the folder containing {RESULTS_DATABASE_NAME}")
+    parser.add_argument("--output", type=Path, help="workbook to write (default: results-<date>.xlsx next to the database)")
+    parser.add_argument("--date", type=date.fromisoformat, help="only export measurements saved on this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    database_path = args.database / RESULTS_DATABASE_NAME if args.database.is_dir() else args.database
+    if not database_path.exists():
+        raise SystemExit(f"No results database found at {database_path}")
+    output_path = args.output or database_path.parent / f"results-{(args.date or date.today()).isoformat()}.xlsx"
+    num_rows = ResultsStore(database_path).export_workbook(output_path, args.date)
+    print(f"Exported {num_rows} measurements to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
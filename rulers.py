@@ -0,0 +1,205 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class RulerStore:
+    """
+    Rulers in coordinates relative to the warped image. A ruler is either
+    straight (two endpoints) or curved (a polyline with vertices between the
+    endpoints, e.g. for a bent fish).
+
+    The endpoints of all rulers are kept in one (n, 2, 2) array
+    ([ruler row, endpoint, x/y]) for vectorized access, with a mapping from
+    ruler id to row. Rows are kept compact by moving the last row into the
+    row of a deleted ruler, so adding, moving and deleting are O(1).
+    The vertices between the endpoints of curved rulers are kept in a
+    (k, 2) array per ruler.
+    Ruler ids increase with creation, so sorting by id gives the order the
+    rulers were created in (used for numbering the measurements).
+    """
+    def __init__(self, capacity: int = 64):
+        self._endpoints = np.zeros((capacity, 2, 2), np.float64)
+        self._ids = np.zeros(capacity, np.int64)
+        self._rows: Dict[int, int] = {}
+        self._inner_vertices: Dict[int, np.ndarray] = {}  # ruler id -> (k, 2), curved rulers only
+        self._size = 0
+        self._next_id = 1
+        # Lengths of the curved rulers, only recomputed for the rulers that change:
+        self._curved_lengths: Dict[int, float] = {}
+        self._curved_lengths_scale: Optional[Tuple[float, float]] = None
+        self.version = 0  # changes on every modification
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, ruler_id: int) -> bool:
+        return ruler_id in self._rows
+
+    @property
+    def endpoints(self) -> np.ndarray:
+        """(n, 2, 2) view of the endpoints of all rulers (in row order)"""
+        return self._endpoints[:self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        """(n,) view of the ruler ids (in row order)"""
+        return self._ids[:self._size]
+
+    def creation_order(self) -> np.ndarray:
+        """Rows sorted by the order the rulers were created"""
+        return np.argsort(self.ids, kind="stable")
+
+    def get(self, ruler_id: int) -> np.ndarray:
+        return self._endpoints[self._rows[ruler_id]]
+
+    def is_curved(self, ruler_id: int) -> bool:
+        return ruler_id in self._inner_vertices
+
+    def vertices(self, ruler_id: int) -> np.ndarray:
+        """(k + 2, 2) vertices of a ruler, from the first to the last endpoint"""
+        endpoints = self.get(ruler_id)
+        inner_vertices = self._inner_vertices.get(ruler_id)
+        if inner_vertices is None:
+            return endpoints.copy()
+        return np.concatenate([endpoints[:1], inner_vertices, endpoints[1:]])
+
+    def add(
+        self,
+        start: Tuple[float, float],
+        end: Tuple[float, float],
+        inner_vertices: Optional[Sequence[Tuple[float, float]]] = None,
+    ) -> int:
+        """Add a ruler, which is curved if inner_vertices (between start and end) are given"""
+        if self._size == len(self._endpoints):
+            self._grow()
+        ruler_id = self._next_id
+        self._next_id += 1
+        row = self._size
+        self._endpoints[row] = (start, end)
+        self._ids[row] = ruler_id
+        self._rows[ruler_id] = row
+        if inner_vertices is not None and len(inner_vertices):
+            self._inner_vertices[ruler_id] = np.array(inner_vertices, np.float64).reshape((-1, 2))
+        self._size += 1
+        self.version += 1
+        return ruler_id
+
+    def move_endpoint(self, ruler_id: int, endpoint: int, x: float, y: float):
+        """endpoint: 0 (first) or 1 (last)"""
+        self._endpoints[self._rows[ruler_id], endpoint] = (x, y)
+        self._curved_lengths.pop(ruler_id, None)
+        self.version += 1
+
+    def move_vertex(self, ruler_id: int, vertex: int, x: float, y: float):
+        """vertex: index in vertices()"""
+        inner_vertices = self._inner_vertices.get(ruler_id)
+        num_inner = 0 if inner_vertices is None else len(inner_vertices)
+        if vertex == 0:
+            self.move_endpoint(ruler_id, 0, x, y)
+        elif vertex == num_inner + 1:
+            self.move_endpoint(ruler_id, 1, x, y)
+        else:
+            inner_vertices[vertex - 1] = (x, y)
+            self._curved_lengths.pop(ruler_id, None)
+            self.version += 1
+
+    def all_vertices(self) -> np.ndarray:
+        """
+        (m, 2) vertices of all rulers: all endpoints (in row order) followed by
+        the inner vertices of the curved rulers (e.g. to transform all rulers
+        at once, see set_all_vertices())
+        """
+        return np.concatenate([self.endpoints.reshape((-1, 2))] + list(self._inner_vertices.values()))
+
+    def set_all_vertices(self, vertices: np.ndarray):
+        """Replace the vertices of all rulers (given in the order of all_vertices())"""
+        vertices = np.asarray(vertices, np.float64).reshape((-1, 2))
+        num_endpoints = 2 * self._size
+        self._endpoints[:self._size] = vertices[:num_endpoints].reshape((-1, 2, 2))
+        start = num_endpoints
+        for ruler_id, inner_vertices in self._inner_vertices.items():
+            self._inner_vertices[ruler_id] = vertices[start:start + len(inner_vertices)].copy()
+            start += len(inner_vertices)
+        self._curved_lengths.clear()
+        self.version += 1
+
+    def lengths(self, scale: Tuple[float, float]) -> np.ndarray:
+        """
+        (n,) lengths of all rulers (in row order), with the relative coordinates
+        scaled by scale (x, y), e.g. to cm (see geometry.relative_to_cm_scale())
+        """
+        deltas = self.endpoints[:, 1] - self.endpoints[:, 0]
+        lengths = np.hypot(deltas[:, 0] * scale[0], deltas[:, 1] * scale[1])
+        if self._inner_vertices:
+            scale = tuple(scale)
+            if scale != self._curved_lengths_scale:
+                self._curved_lengths.clear()
+                self._curved_lengths_scale = scale
+            for ruler_id in self._inner_vertices:
+                if ruler_id not in self._curved_lengths:
+                    self._curved_lengths[ruler_id] = polyline_length(self.vertices(ruler_id), scale)
+                lengths[self._rows[ruler_id]] = self._curved_lengths[ruler_id]
+        return lengths
+
+    def delete(self, ruler_id: int):
+        row = self._rows.pop(ruler_id)
+        self._inner_vertices.pop(ruler_id, None)
+        self._curved_lengths.pop(ruler_id, None)
+        last = self._size - 1
+        if row != last:
+            # move the last row into the deleted row
+            self._endpoints[row] = self._endpoints[last]
+            self._ids[row] = self._ids[last]
+            self._rows[int(self._ids[row])] = row
+        self._size -= 1
+        self.version += 1
+
+    def clear(self):
+        self._rows.clear()
+        self._inner_vertices.clear()
+        self._curved_lengths.clear()
+        self._size = 0
+        self.version += 1
+
+    def _grow(self):
+        capacity = 2 * len(self._endpoints)
+        endpoints = np.zeros((capacity, 2, 2), np.float64)
+        endpoints[:self._size] = self.endpoints
+        ids = np.zeros(capacity, np.int64)
+        ids[:self._size] = self.ids
+        self._endpoints = endpoints
+        self._ids = ids
+
+
+def polyline_length(vertices: np.ndarray, scale: Tuple[float, float] = (1.0, 1.0)) -> float:
+    """Arc length of a polyline given by (k, 2) vertices, with the coordinates scaled by scale (x, y)"""
+    deltas = np.diff(vertices, axis=0) * scale
+    return float(np.hypot(deltas[:, 0], deltas[:, 1]).sum())
+
+
+def ruler_label_anchors(endpoints: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Where to place the labels of all rulers, given their (n, 2, 2) relative endpoints.
+    For simplicity, the label is placed at the endpoint closest to the image center
+    (this assumes the fish to be laid down along the edge of the box), on the side
+    facing away from the other endpoint: over/under it for lines closest to vertical,
+    and left/right of it for lines closest to horizontal.
+
+    Returns the (n, 2) relative anchor points and the (n, 2) unit directions
+    (along x or y) to move the labels away from the anchors.
+    """
+    rows = np.arange(len(endpoints))
+    p1 = endpoints[:, 0]
+    p2 = endpoints[:, 1]
+    deltas = p2 - p1
+    # 0: horizontally aligned (place label left/right), 1: vertically aligned (over/under),
+    # where vertically aligned means a line with slope higher than 45 deg:
+    axis = (np.abs(deltas[:, 1]) > np.abs(deltas[:, 0])).astype(np.intp)
+    use_p1 = np.abs(p1[rows, axis] - 0.5) <= np.abs(p2[rows, axis] - 0.5)
+    anchors = np.where(use_p1[:, None], p1, p2)
+    # Direction from p1 to p2 (p1 is taken to be left of/above p2 for equal coordinates):
+    p1_to_p2 = np.where(deltas[rows, axis] >= 0, 1.0, -1.0)
+    directions = np.zeros_like(anchors)
+    directions[rows, axis] = np.where(use_p1, -p1_to_p2, p1_to_p2)
+    return anchors, directions
@@ -0,0 +1,126 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import tkinter as tk
+
+
+# tkinter can't query the monitor refresh rate, so assume the common 60 Hz
+DEFAULT_FRAME_RATE = 60
+
+
+class LatencyStats:
+    """Input-to-paint latency (time from the first redraw request until it was rendered)"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, latency: float):
+        self.frames += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.last = latency
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.frames if self.frames else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.frames} frames, input-to-paint latency"
+            f" mean {self.mean * 1000:.1f} ms, max {self.max * 1000:.1f} ms"
+        )
+
+
+class RedrawScheduler:
+    """
+    Coalesces redraw requests into at most one render per frame.
+
+    The scene is split into named parts (registered in render order). Requesting
+    a redraw only marks parts as dirty; the dirty parts are rendered together
+    when tkinter is idle, but no more often than the frame rate allows. A
+    deadline timer makes sure a frame is rendered within max_latency_ms even if
+    tkinter never becomes idle (e.g. a continuous stream of motion events).
+
+    A part may provide an inputs function returning a snapshot (compared with ==)
+    of what the part depends on; the render is skipped if it equals the snapshot of the
+    last render of that part.
+    """
+    def __init__(
+        self,
+        widget: tk.Misc,
+        frame_rate: float = DEFAULT_FRAME_RATE,
+        max_latency_ms: int = 50,
+    ):
+        self.widget = widget
+        self.frame_interval = 1 / frame_rate
+        self.max_latency_ms = max_latency_ms
+        self.latency = LatencyStats()
+        self._parts: Dict[str, Tuple[Callable[[], None], Optional[Callable[[], Any]]]] = {}
+        self._rendered_inputs: Dict[str, Any] = {}
+        self._dirty: Set[str] = set()
+        self._jobs: List[str] = []
+        self._requested_at: Optional[float] = None
+        self._last_frame_at = 0.0
+
+    def register(self, part: str, render: Callable[[], None], inputs: Optional[Callable[[], Any]] = None):
+        self._parts[part] = (render, inputs)
+
+    def request(self, *parts: str):
+        """Mark parts (default: all) as dirty and make sure a frame is scheduled"""
+        self._dirty.update(parts or self._parts)
+        if self._requested_at is None:
+            self._requested_at = time.perf_counter()
+        if self._jobs:  # frame already scheduled
+            return
+        wait_ms = int((self._last_frame_at + self.frame_interval - time.perf_counter()) * 1000)
+        if wait_ms > 0:
+            # frame rate limit: wait for the next frame before waiting for idle
+            self._jobs = [self.widget.after(wait_ms, self._schedule_frame)]
+        else:
+            self._schedule_frame()
+
+    def invalidate(self, *parts: str):
+        """Request a redraw of parts (default: all), even if their inputs are unchanged"""
+        for part in parts or self._parts:
+            self._rendered_inputs.pop(part, None)
+        self.request(*parts)
+
+    def flush(self):
+        """Render pending parts immediately"""
+        if self._dirty:
+            self._cancel_jobs()
+            self._frame()
+
+    def _schedule_frame(self):
+        self._jobs = [
+            self.widget.after_idle(self._frame),
+            self.widget.after(self.max_latency_ms, self._frame),  # deadline
+        ]
+
+    def _cancel_jobs(self):
+        for job in self._jobs:
+            self.widget.after_cancel(job)
+        self._jobs = []
+
+    def _frame(self):
+        self._cancel_jobs()
+        dirty = self._dirty
+        self._dirty = set()
+        requested_at = self._requested_at
+        self._requested_at = None
+        for part, (render, inputs) in self._parts.items():
+            if part not in dirty:
+                continue
+            part_inputs = inputs() if inputs is not None else None
+            if part_inputs is not None and self._rendered_inputs.get(part) == part_inputs:
+                continue  # nothing changed since last render
+            render()
+            if part_inputs is not None:
+                self._rendered_inputs[part] = part_inputs
+        self._last_frame_at = time.perf_counter()
+        if requested_at is not None:
+            self.latency.add(self._last_frame_at - requested_at)
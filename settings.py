@@ -1,17 +1,27 @@
-from typing import Dict
-from dataclasses import dataclass
+from typing import Dict, List
+from dataclasses import dataclass, field
 import dacite
 from pathlib import Path
 import json
 
+import cv2.cv2 as cv2
+
 
 DEFAULT_SETTINGS_PATH = Path.cwd() / 'fish-mesh-settings.json'
+# Marker id -> (x, y) position of the marker center (in cm from the upper left corner of the box),
+# by default a marker on each corner of the default measure box:
+DEFAULT_MARKER_POSITIONS = {"0": [0.0, 0.0], "1": [42.0, 0.0], "2": [42.0, 29.6], "3": [0.0, 29.6]}
 
 
 class SettingsError(Exception):
     pass
 
 
+def is_marker_dictionary(name: str) -> bool:
+    """If name is one of the predefined ArUco dictionaries (e.g. "DICT_4X4_50")"""
+    return hasattr(cv2, "aruco") and name.startswith("DICT_") and hasattr(cv2.aruco, name)
+
+
 @dataclass
 class Settings:
     measure_box_width: float = 42.0
@@ -21,6 +31,17 @@ class Settings:
     point_size: int = 1
     show_mini_window_on_start: bool = True
     draw_color: str = "#ffff00"  # yellow
+    memory_budget_mb: int = 0  # 0: no budget
+    save_data_per_photo: bool = False
+    prefetch_count: int = 2
+    detect_reference_box: bool = True
+    snap_box_corners: bool = True
+    snap_ruler_endpoints: bool = False
+    detect_fish_on_measure: bool = False
+    use_fiducial_markers: bool = False
+    marker_dictionary: str = "DICT_4X4_50"
+    marker_size: float = 3.0  # cm
+    marker_positions: Dict[str, List[float]] = field(default_factory=lambda: dict(DEFAULT_MARKER_POSITIONS))
 
     def validate(self):
         if not self.measure_box_width > 0:
@@ -33,6 +54,22 @@ class Settings:
             raise SettingsError("'Point size' must be larger than 0")
         if not 0 < self.measure_box_margin_percentage <= 20:
             raise SettingsError("'Measure box margin percentage' must be between 0 and 20")
+        if not self.memory_budget_mb >= 0:
+            raise SettingsError("'Memory budget mb' must be 0 or larger")
+        if not self.prefetch_count >= 0:
+            raise SettingsError("'Prefetch count' must be 0 or larger")
+        if not self.marker_size > 0:
+            raise SettingsError("'Marker size' must be larger than 0")
+        if not all(len(position) == 2 for position in self.marker_positions.values()):
+            raise SettingsError("'Marker positions' must be given as [x, y] for each marker id")
+        if self.use_fiducial_markers:
+            if not hasattr(cv2, "aruco"):
+                raise SettingsError(
+                    "'Use fiducial markers' requires OpenCV with the aruco module"
+                    " (OpenCV 4.7 or newer, or opencv-contrib-python)"
+                )
+            if not is_marker_dictionary(self.marker_dictionary):
+                raise SettingsError(f"Unknown 'Marker dictionary' {repr(self.marker_dictionary)}")
 
     @staticmethod
     def from_dict(d: Dict):
@@ -76,4 +113,58 @@ SETTING_DESCRIPTIONS = dict(
         "The color of everything drawn within the program."
         "\nFor simplicity this is limited to a single color."
     ),
+    memory_budget_mb=(
+        "The maximum size (in MB) of a full resolution image kept in memory."
+        "\nLarger images are kept in a temporary file on disk instead,"
+        "\nand only the smaller images shown on screen are kept in memory."
+        "\nUseful on devices with little memory. A value of 0 means no limit."
+    ),
+    save_data_per_photo=(
+        "Also save the measurements of each image to its own excel"
+        "\nfile (D-<name>.xlsx). The measurements are always added to the"
+        "\nresults of the output folder (fish-mesh-results.sqlite), which"
+        "\ncan be exported to one excel file with results_store.py."
+    ),
+    prefetch_count=(
+        "When working through a folder (Open Folder), the number of next"
+        "\nphotos decoded in the background while measuring, so moving"
+        "\nto the next photo is instant. Each takes the memory of a full"
+        "\nresolution image until it's opened (only of its preview with a"
+        "\nmemory budget). 0 turns prefetching off."
+    ),
+    detect_reference_box=(
+        "Place the bounding box corners on the reference box automatically"
+        "\nwhen opening an image. If no box is found, the corners are placed"
+        "\nat the default position."
+    ),
+    snap_box_corners=(
+        "Move a dragged bounding box corner onto the nearest clear corner"
+        "\nin the image (e.g. the corner of the reference box) when released."
+    ),
+    snap_ruler_endpoints=(
+        "Move drawn ruler endpoints onto the nearest clear edge along"
+        "\nthe ruler (e.g. the snout or the tail fork of the fish)."
+    ),
+    detect_fish_on_measure=(
+        "Detect fish in the box and add a ruler along each of them when"
+        "\nmoving to the measurement window (if no rulers are drawn yet)."
+        "\nThe proposed rulers can be adjusted or deleted like drawn rulers."
+    ),
+    use_fiducial_markers=(
+        "Place the bounding box corners using fiducial (ArUco) markers"
+        "\nprinted on the reference box when opening an image."
+        "\nThe box is fitted to all detected markers, so some of them"
+        "\nmay be covered. Falls back to detecting the box outline."
+    ),
+    marker_dictionary=(
+        "The OpenCV ArUco dictionary of the printed markers (e.g. DICT_4X4_50)"
+    ),
+    marker_size=(
+        "The side length (in cm) of the printed markers"
+    ),
+    marker_positions=(
+        "The position of each marker on the reference box, given as"
+        "\nmarker id: [x, y] of the marker center in cm from the upper"
+        "\nleft corner of the box. Edit in the settings file."
+    ),
 )
\ No newline at end of file
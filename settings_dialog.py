@@ -10,10 +10,14 @@ from settings import (
 )
 
 
+# Types of settings that can be given in a tk.Entry (converted with the type):
+ENTRY_TYPES = (int, float, str, bool)
+
+
 @dataclass
 class SettingsDialogField:
     label: Optional[tk.Label] = None
-    entry: Optional[Union[tk.Entry, tk.Button]] = None
+    entry: Optional[Union[tk.Entry, tk.Button, tk.Label]] = None
     type: Optional[type] = None
     value: Optional[Any] = None
 
@@ -35,11 +39,12 @@ class SettingsDialog(tk.simpledialog.Dialog):
                     len(var_to_text(field.name))
                 )
         else:  # default settings values from class
+            default_settings = Settings()
             self.selected_draw_color = Settings.draw_color
             self.show_mini_window = Settings.show_mini_window_on_start
             for field in fields(Settings):
                 self.fields[field.name] = SettingsDialogField(
-                    value=getattr(Settings, field.name),
+                    value=getattr(default_settings, field.name),
                     type=field.type
                 )
                 max_width_required = max(
@@ -77,6 +82,17 @@ class SettingsDialog(tk.simpledialog.Dialog):
                     command=self.toggle_show_mini_window,
                 )
                 self.fields[field].entry.grid(row=row, column=1)
+            elif self.fields[field].type is bool:
+                self.fields[field].entry = tk.Button(
+                    frame,
+                    text="Yes" if self.fields[field].value else "No",
+                    command=partial(self.toggle_bool_field, field),
+                )
+                self.fields[field].entry.grid(row=row, column=1)
+            elif self.fields[field].type not in ENTRY_TYPES:
+                # e.g. marker_positions (a dict), which is only edited in the settings file:
+                self.fields[field].entry = tk.Label(frame, text="(edit in settings file)")
+                self.fields[field].entry.grid(row=row, column=1)
             else:
                 self.fields[field].entry = tk.Entry(frame)#, width=self.field_width)
                 self.fields[field].entry.insert(tk.END, self.fields[field].value)  # show existing value
@@ -147,6 +163,11 @@ class SettingsDialog(tk.simpledialog.Dialog):
         )
         self.fields["show_mini_window_on_start"].value = new_value
 
+    def toggle_bool_field(self, field: str):
+        new_value = not self.fields[field].value
+        self.fields[field].entry.configure(text=("Yes" if new_value else "No"))
+        self.fields[field].value = new_value
+
     def read_entries(self):
         for field in self.fields:
             if isinstance(self.fields[field].entry, tk.Entry):
@@ -155,6 +176,10 @@ class SettingsDialog(tk.simpledialog.Dialog):
                 self.fields["draw_color"].value = self.selected_draw_color
             elif field == "show_mini_window_on_start":
                 self.fields["show_mini_window_on_start"].value = self.show_mini_window
+            elif self.fields[field].type is bool:
+                pass  # value is set when toggled (see toggle_bool_field())
+            elif self.fields[field].type not in ENTRY_TYPES:
+                pass  # not editable in the dialog
             else:
                 TypeError(
                     "Unknown type for 'entry' property to receive"
@@ -202,7 +227,8 @@ class SettingsDialog(tk.simpledialog.Dialog):
 
     def get_settings(self) -> Settings:
         return Settings(**{
-            name: field.type(field.value) for name, field in self.fields.items()
+            name: field.type(field.value) if field.type in ENTRY_TYPES else field.value
+            for name, field in self.fields.items()
         })
 
 
@@ -0,0 +1,68 @@
+import builtins
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+# Number of the slowest imported packages listed in the startup report (the rest are summed up):
+REPORTED_IMPORTS = 8
+
+
+class ImportTimer:
+    """
+    Measures how long imports take, per top level package (e.g. "cv2" or "pandas"),
+    while started. Time spent importing another package from within a package is
+    counted for that other package, so the times add up to the total import time.
+
+    (For a detailed breakdown of a single run, use python -X importtime fish_mesh.py)
+    """
+    def __init__(self):
+        self.times: Dict[str, float] = defaultdict(float)
+        self._nested_times: List[float] = []  # time spent in nested imports, per active import
+        self._original_import = None
+
+    def start(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        builtins.__import__ = self._original_import
+
+    @property
+    def total(self) -> float:
+        return sum(self.times.values())
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or (name in sys.modules and not fromlist):
+            # (relative or already imported; from ... import might still import submodules)
+            return self._original_import(name, globals, locals, fromlist, level)
+        start_time = time.perf_counter()
+        self._nested_times.append(0.0)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            nested_time = self._nested_times.pop()
+            self.times[name.partition(".")[0]] += elapsed - nested_time
+            if self._nested_times:
+                self._nested_times[-1] += elapsed
+
+
+def startup_report(start_time: float, import_timer: ImportTimer, steps: List[Tuple[str, float]]) -> str:
+    """
+    One line summary of the startup, e.g. for the log
+    start_time: time.perf_counter() when the program started
+    steps: (name, duration) of the other startup steps (e.g. setting up the window)
+    """
+    imports = sorted(import_timer.times.items(), key=lambda item: item[1], reverse=True)
+    import_times = [f"{package} {duration * 1000:.0f} ms" for package, duration in imports[:REPORTED_IMPORTS]]
+    if len(imports) > REPORTED_IMPORTS:
+        other_time = sum(duration for _, duration in imports[REPORTED_IMPORTS:])
+        import_times.append(f"{len(imports) - REPORTED_IMPORTS} other {other_time * 1000:.0f} ms")
+    step_times = [f"{name} {duration * 1000:.0f} ms" for name, duration in steps]
+    return (
+        f"Startup: first window after {(time.perf_counter() - start_time) * 1000:.0f} ms"
+        f" (imports {import_timer.total * 1000:.0f} ms: {', '.join(import_times)};"
+        f" {', '.join(step_times)})"
+    )